@@ -0,0 +1,147 @@
+# scripts/block_reduce.py
+
+import os
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+METHODS = ("any", "max", "min", "mean", "fraction", "mode")
+
+
+def block_edges(n_src: int, n_dst: int) -> np.ndarray:
+    """
+    Source index where each of the `n_dst` output blocks starts, plus the end.
+    Blocks differ in size by at most one when `n_src` is not a multiple of
+    `n_dst`, so every source row/column belongs to exactly one block.
+    """
+    if n_dst > n_src:
+        raise ValueError(f"Cannot block-reduce {n_src} cells to {n_dst}")
+    return (np.arange(n_dst + 1) * n_src) // n_dst
+
+
+def _valid(data: np.ndarray, nodata=None) -> np.ndarray:
+    valid = np.ones(data.shape, dtype=bool) if nodata is None else data != nodata
+    if np.issubdtype(data.dtype, np.floating):
+        valid &= ~np.isnan(data)
+    return valid
+
+
+def _reduce(data: np.ndarray, row_starts: np.ndarray, col_starts: np.ndarray,
+            method: str, nodata=None, valid: np.ndarray = None) -> np.ndarray:
+    """Reduce a 2-D array over the blocks starting at `row_starts` x `col_starts`."""
+    if valid is None:
+        valid = _valid(data, nodata)
+
+    def block_sum(values):
+        return np.add.reduceat(np.add.reduceat(values, col_starts, axis=1), row_starts, axis=0)
+
+    n_valid = block_sum(valid.astype(np.int32))
+    if method == "any":
+        return block_sum((valid & (data > 0)).astype(np.int32)) > 0
+    if method == "fraction":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return block_sum((valid & (data > 0)).astype(np.float64)) / n_valid
+    if method == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return block_sum(np.where(valid, data, 0).astype(np.float64)) / n_valid
+    if method in ("max", "min"):
+        info = np.finfo if np.issubdtype(data.dtype, np.floating) else np.iinfo
+        fill = info(data.dtype).min if method == "max" else info(data.dtype).max
+        ufunc = np.maximum if method == "max" else np.minimum
+        filled = np.where(valid, data, fill)
+        out = ufunc.reduceat(ufunc.reduceat(filled, col_starts, axis=1), row_starts, axis=0)
+        return np.where(n_valid > 0, out, nodata if nodata is not None else fill)
+    if method == "mode":
+        classes = np.unique(data[valid])
+        if classes.size == 0:
+            return np.full(n_valid.shape, nodata if nodata is not None else 0, dtype=data.dtype)
+        counts = np.stack([block_sum((valid & (data == c)).astype(np.int32)) for c in classes])
+        out = classes[np.argmax(counts, axis=0)]
+        return np.where(n_valid > 0, out, nodata if nodata is not None else 0).astype(data.dtype)
+    raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+
+def block_reduce(data: np.ndarray, target_shape: tuple, method: str = "mean",
+                 nodata=None) -> np.ndarray:
+    """
+    Downsample a 2-D array to `target_shape` by reducing every block.
+
+    Methods: "any" (bool), "max", "min", "mean" and "fraction" (share of valid
+    pixels > 0, e.g. burned or flammable), "mode" (most common class).
+    `nodata` pixels (and NaN) are ignored; blocks without valid pixels get
+    NaN for mean/fraction and `nodata` otherwise.
+    """
+    rows = block_edges(data.shape[0], target_shape[0])
+    cols = block_edges(data.shape[1], target_shape[1])
+    return _reduce(data, rows[:-1], cols[:-1], method, nodata)
+
+
+def _output_dtype(method: str, src_dtype: str):
+    return {"any": np.uint8, "mean": np.float32, "fraction": np.float32}.get(method, src_dtype)
+
+
+def block_reduce_band(src,
+                      target_shape: tuple,
+                      method: str = "mean",
+                      band: int = 1,
+                      preprocess=None,
+                      max_strip_rows: int = 1024) -> np.ndarray:
+    """
+    `block_reduce` one band of an open rasterio dataset without loading it
+    whole. The band is read in row strips of whole output rows, up to
+    `max_strip_rows` source rows each. `preprocess`, if given, maps each
+    strip before reducing (e.g. land-cover classes to binary fuel); source
+    nodata pixels stay excluded, as do pixels it maps to NaN.
+    """
+    th, tw = target_shape
+    nodata = src.nodata
+    row_edges = block_edges(src.height, th)
+    col_starts = block_edges(src.width, tw)[:-1]
+    out = np.empty(target_shape, dtype=_output_dtype(method, src.dtypes[band - 1]))
+
+    t0 = 0
+    while t0 < th:
+        t1 = t0 + 1
+        while t1 < th and row_edges[t1 + 1] - row_edges[t0] <= max_strip_rows:
+            t1 += 1
+        window = Window(0, row_edges[t0], src.width, row_edges[t1] - row_edges[t0])
+        strip = src.read(band, window=window)
+        valid = _valid(strip, nodata)
+        if preprocess is not None:
+            strip = preprocess(strip)
+            valid &= _valid(strip)
+        out[t0:t1] = _reduce(strip, row_edges[t0:t1] - row_edges[t0], col_starts,
+                             method, nodata, valid)
+        t0 = t1
+    return out
+
+
+def block_reduce_raster(src_path: str,
+                        dst_path: str,
+                        target_shape: tuple,
+                        method: str = "mean",
+                        preprocess=None,
+                        max_strip_rows: int = 1024) -> np.ndarray:
+    """
+    `block_reduce_band` a single-band raster into a new GeoTIFF covering
+    the same extent, with pixels enlarged to match `target_shape`. Returns
+    the reduced array.
+    """
+    th, tw = target_shape
+    with rasterio.open(src_path) as src:
+        nodata = src.nodata
+        out = block_reduce_band(src, target_shape, method, 1, preprocess, max_strip_rows)
+        out_dtype = out.dtype
+        transform = src.transform * src.transform.scale(src.width / tw, src.height / th)
+        profile = src.profile.copy()
+
+    out_nodata = np.nan if method in ("mean", "fraction") else (None if method == "any" else nodata)
+    profile.update(driver="GTiff", height=th, width=tw, count=1, dtype=out_dtype,
+                   transform=transform, nodata=out_nodata)
+    for key in ("tiled", "blockxsize", "blockysize"):
+        profile.pop(key, None)
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    with rasterio.open(dst_path, "w", **profile) as dst:
+        dst.write(out, 1)
+    return out
@@ -0,0 +1,179 @@
+# scripts/build_training_dataset.py
+
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import rasterio
+
+from feature_store import FeatureStore, missing_mask
+
+MANIFEST_FILE = "manifest.json"
+
+
+class _ShardWriter:
+    """
+    Scatter samples into `n_shards` spill files at random, then shuffle each
+    shard in memory. This is a two-pass external shuffle: memory holds one
+    block of samples at a time, then one shard.
+    """
+
+    def __init__(self, out_dir: str, n_shards: int, n_features: int, rng: np.random.Generator,
+                 dtype=np.float32):
+        self.out_dir = out_dir
+        self.n_shards = n_shards
+        self.n_features = n_features
+        self.dtype = np.dtype(dtype)
+        self.rng = rng
+        self.spill_dir = os.path.join(out_dir, "_spill")
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+        os.makedirs(self.spill_dir)
+        for old in glob.glob(os.path.join(out_dir, "shard_*.npy")):
+            os.remove(old)
+        self.counts = np.zeros(n_shards, dtype=np.int64)
+
+    def _spill(self, shard: int, kind: str) -> str:
+        return os.path.join(self.spill_dir, f"{shard:04d}.{kind}")
+
+    def add(self, X: np.ndarray, y: np.ndarray, weight: np.ndarray):
+        shard_of = self.rng.integers(self.n_shards, size=len(y))
+        order = np.argsort(shard_of, kind="stable")
+        bounds = np.searchsorted(shard_of[order], np.arange(self.n_shards + 1))
+        for shard in range(self.n_shards):
+            idx = order[bounds[shard]:bounds[shard + 1]]
+            if idx.size == 0:
+                continue
+            for kind, values in (("X", X[idx]), ("y", y[idx]), ("w", weight[idx])):
+                with open(self._spill(shard, kind), "ab") as f:
+                    f.write(np.ascontiguousarray(values).tobytes())
+            self.counts[shard] += idx.size
+
+    def close(self) -> list:
+        """Shuffle every spill file into shard_XXXX_{X,y,w}.npy; returns the shard sizes."""
+        for shard in range(self.n_shards):
+            n = int(self.counts[shard])
+            if n == 0:
+                continue
+            X = np.fromfile(self._spill(shard, "X"), dtype=self.dtype).reshape(n, self.n_features)
+            y = np.fromfile(self._spill(shard, "y"), dtype=np.uint8)
+            w = np.fromfile(self._spill(shard, "w"), dtype=np.float32)
+            perm = self.rng.permutation(n)
+            prefix = os.path.join(self.out_dir, f"shard_{shard:04d}")
+            np.save(f"{prefix}_X.npy", X[perm])
+            np.save(f"{prefix}_y.npy", y[perm])
+            np.save(f"{prefix}_w.npy", w[perm])
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+        return self.counts.tolist()
+
+
+def sample_block(features: np.ndarray,
+                 labels: np.ndarray,
+                 rng: np.random.Generator,
+                 neg_rate: float,
+                 pos_repeat: float):
+    """
+    Class-balanced samples from one block.
+
+    Valid pixels have a label >= 0 and no missing feature. Negatives are kept
+    with probability `neg_rate`; positives are repeated `pos_repeat` times
+    on average (stochastic rounding). Weights undo the sampling, so
+    weighted statistics match the full data.
+    """
+    valid = (labels >= 0) & ~missing_mask(features).any(axis=-1)
+    X, y = features[valid], labels[valid].astype(np.uint8)
+
+    pos = y == 1
+    keep_neg = ~pos & (rng.random(len(y)) < neg_rate)
+    repeats = np.floor(pos_repeat + rng.random(len(y))).astype(np.int64)
+    counts = np.where(pos, repeats, keep_neg.astype(np.int64))
+    idx = np.repeat(np.arange(len(y)), counts)
+    weight = np.where(pos[idx], 1.0 / pos_repeat, 1.0 / neg_rate).astype(np.float32)
+    return X[idx], y[idx], weight
+
+
+def build_dataset(store: FeatureStore,
+                  label_pattern: str,
+                  out_dir: str,
+                  dates: list = None,
+                  neg_rate: float = 0.05,
+                  pos_repeat: float = 1.0,
+                  n_shards: int = 16,
+                  block_size: int = 512,
+                  seed: int = 42) -> dict:
+    """
+    Stream (features, label) samples for many days into shuffled shards.
+
+    For every date with a label raster (`label_pattern` formatted with
+    date=YYYYMMDD, on the store grid), the store is read block by block and
+    each block is subsampled with `sample_block`, then scattered into
+    shards. Peak memory is one block plus one shard, whatever the number of
+    days. X keeps the store's dtype, so a quantized store gives uint8
+    shards. Writes shard_XXXX_{X,y,w}.npy and a manifest; returns the manifest.
+    """
+    dates = dates or store.dates()
+    names = store.feature_names(dates[0])
+    rng = np.random.default_rng(seed)
+    writer = _ShardWriter(out_dir, n_shards, len(names), rng, store.dtype)
+    totals = {"pixels": 0, "fire_pixels": 0, "samples": 0, "fire_samples": 0}
+    used_dates = []
+
+    for date in dates:
+        label_path = label_pattern.format(date=date.replace("-", ""))
+        if not os.path.exists(label_path):
+            print(f"⚠️ No labels for {date}, skipping")
+            continue
+        if store.feature_names(date) != names:
+            raise ValueError(f"Features for {date} differ from {dates[0]}")
+        used_dates.append(date)
+        with rasterio.open(label_path) as src:
+            if (src.height, src.width) != store.shape:
+                raise ValueError(f"{label_path} is {src.height}x{src.width}, "
+                                 f"store grid is {store.shape}")
+            for window, block in store.iter_blocks(names, date, block_size):
+                labels = src.read(1, window=window).astype(np.int16)
+                totals["pixels"] += int(np.count_nonzero(labels >= 0))
+                totals["fire_pixels"] += int(np.count_nonzero(labels == 1))
+                X, y, w = sample_block(block, labels, rng, neg_rate, pos_repeat)
+                if len(y):
+                    writer.add(X, y, w)
+                    totals["samples"] += len(y)
+                    totals["fire_samples"] += int(y.sum())
+        print(f"✅ Sampled {date}: {totals['samples']} samples so far")
+
+    manifest = {"features": names, "dtype": store.dtype.str,
+                "encoding": store.feature_encoding(names), "dates": used_dates, "neg_rate": neg_rate,
+                "pos_repeat": pos_repeat, "seed": seed, "shard_sizes": writer.close(), **totals}
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def load_shards(dataset_dir: str, mmap_mode: str = "r"):
+    """Yield (X, y, weight) per shard, memory-mapped by default."""
+    for x_path in sorted(glob.glob(os.path.join(dataset_dir, "shard_*_X.npy"))):
+        prefix = x_path[:-len("_X.npy")]
+        yield (np.load(x_path, mmap_mode=mmap_mode),
+               np.load(f"{prefix}_y.npy", mmap_mode=mmap_mode),
+               np.load(f"{prefix}_w.npy", mmap_mode=mmap_mode))
+
+
+if __name__ == "__main__":
+    # Paths
+    store_dir     = "data/processed/feature_store"
+    label_pattern = "data/processed/fire_labels/fire_{date}_downsampled_11x13.tif"
+    out_dir       = "data/processed/training_dataset"
+
+    # Sampling
+    neg_rate   = 0.05   # keep 5% of no-fire pixels
+    pos_repeat = 2.0    # each fire pixel appears twice on average
+    n_shards   = 16
+
+    store = FeatureStore.open(store_dir)
+    manifest = build_dataset(store, label_pattern, out_dir, neg_rate=neg_rate,
+                             pos_repeat=pos_repeat, n_shards=n_shards)
+    print(f"📊 {len(manifest['dates'])} days, {manifest['pixels']} labelled pixels "
+          f"({manifest['fire_pixels']} fire) → {manifest['samples']} samples "
+          f"({manifest['fire_samples']} fire) in {n_shards} shards")
+    print("✅ Saved training dataset to", out_dir)
@@ -0,0 +1,65 @@
+import numpy as np
+
+from fire_spread_simulation import ActiveFront, spread_one_hour, spread_one_hour_vectorized
+
+# Statistical equivalence check: both engines must give the same per-cell
+# ignition frequencies on the same inputs (they use different random streams).
+rows, cols = 11, 13
+n_runs = 2000
+setup_rng = np.random.default_rng(0)
+
+current_mask = (setup_rng.random((rows, cols)) < 0.15).astype(np.uint8)
+wind_u = setup_rng.normal(0, 3, (rows, cols)).astype(np.float32)
+wind_v = setup_rng.normal(0, 3, (rows, cols)).astype(np.float32)
+slope = setup_rng.random((rows, cols)).astype(np.float32) * 0.5
+fuel = (setup_rng.random((rows, cols)) < 0.8).astype(np.uint8)
+ignition_prob = 0.1
+
+np.random.seed(1)
+rng = np.random.default_rng(2)
+loop_hits = np.zeros((rows, cols))
+vec_hits = np.zeros((rows, cols))
+for _ in range(n_runs):
+    loop_hits += spread_one_hour(current_mask, wind_u, wind_v, slope, fuel, ignition_prob)
+    vec_hits += spread_one_hour_vectorized(current_mask, wind_u, wind_v, slope, fuel,
+                                           ignition_prob, rng=rng)
+
+p_loop = loop_hits / n_runs
+p_vec = vec_hits / n_runs
+
+# Two-proportion z-test per cell
+pooled = (loop_hits + vec_hits) / (2 * n_runs)
+se = np.sqrt(2 * pooled * (1 - pooled) / n_runs)
+z = np.divide(np.abs(p_loop - p_vec), se, out=np.zeros_like(se), where=se > 0)
+
+print(f"🔥 Cells that can ignite: {np.count_nonzero(pooled)}")
+print(f"📊 Max |p_loop - p_vec|: {np.abs(p_loop - p_vec).max():.4f}, max z: {z.max():.2f}")
+
+if np.any((p_loop > 0) != (p_vec > 0)):
+    print("❌ Engines disagree on which cells can ignite")
+elif z.max() > 4.5:
+    print("❌ Ignition frequencies differ beyond sampling noise")
+else:
+    print("✅ Vectorized engine matches the loop reference")
+
+# Determinism check: the frontier engine must burn exactly the same cells as
+# the vectorized engine over several hours when both share a seed.
+dense_rng = np.random.default_rng(7)
+front_rng = np.random.default_rng(7)
+dense_mask = (setup_rng.random((60, 80)) < 0.01).astype(np.uint8)
+big_u = setup_rng.normal(0, 3, dense_mask.shape).astype(np.float32)
+big_v = setup_rng.normal(0, 3, dense_mask.shape).astype(np.float32)
+big_slope = setup_rng.random(dense_mask.shape).astype(np.float32)
+big_fuel = (setup_rng.random(dense_mask.shape) < 0.9).astype(np.uint8)
+
+front = ActiveFront(dense_mask, big_slope, big_fuel)
+for hour in range(12):
+    new_ignitions = spread_one_hour_vectorized(dense_mask, big_u, big_v, big_slope, big_fuel,
+                                               rng=dense_rng)
+    dense_mask = np.clip(dense_mask + new_ignitions, 0, 1)
+    front.step(big_u, big_v, front_rng)
+    if not np.array_equal(dense_mask, front.mask):
+        print(f"❌ Frontier engine diverges from the vectorized engine at hour {hour + 1}")
+        break
+else:
+    print(f"✅ Frontier engine matches the vectorized engine ({dense_mask.sum()} cells burned)")
@@ -0,0 +1,254 @@
+# scripts/compiled_forest.py
+
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # optional: the NumPy evaluator is used instead
+    numba = None
+
+META_FILE = "forest.json"
+NODE_ARRAYS = ("feature", "threshold", "children", "missing_left", "value")
+
+
+def file_sha1(path: str, chunk_size: int = 1 << 22) -> str:
+    """SHA-1 of a file's contents, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous node arrays.
+
+    All trees share one set of arrays; `roots[t]` is the first node of tree
+    t and `children[n]` holds the global (left, right) child indices.
+    Leaves point to themselves, so every sample can take exactly
+    `max_depth` steps down its tree without branching on leaf tests.
+    `value` holds each node's normalised class probabilities, as sklearn's
+    trees return them.
+
+    sklearn compares float32 inputs against float64 thresholds. For a
+    float32 x, `x <= t` holds exactly when x <= the largest float32 not
+    above t, so thresholds are stored rounded down to float32 and the
+    comparison stays exact in single precision.
+
+    The arrays are plain .npy files opened with mmap, so loading is cheap
+    and several processes share the same pages. Implements `classes_`,
+    `n_features_in_`, `predict_proba` and `predict`, so it can stand in
+    for the sklearn model in predict_fullstack.py.
+    """
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.arrays = arrays
+        self.meta = meta
+        self.classes_ = np.array(meta["classes"])
+        self.n_features_in_ = meta["n_features"]
+        self.feature_encoding_ = meta.get("feature_encoding")
+        self.feature_names_ = meta.get("feature_names")
+
+    # === Export / load ===
+    @classmethod
+    def from_sklearn(cls, model, source_path: str = None):
+        """Flatten `model`; `source_path` is the joblib it was loaded from, recorded by hash."""
+        trees = [est.tree_ for est in model.estimators_]
+        sizes = [tree.node_count for tree in trees]
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+
+        parts = {name: [] for name in NODE_ARRAYS}
+        for tree, root in zip(trees, roots):
+            own = np.arange(tree.node_count, dtype=np.int32) + root
+            leaf = tree.children_left == -1
+            parts["feature"].append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            threshold = tree.threshold.astype(np.float32)
+            above = threshold > tree.threshold
+            threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+            parts["threshold"].append(threshold)
+            parts["children"].append(np.stack([
+                np.where(leaf, own, tree.children_left + root),
+                np.where(leaf, own, tree.children_right + root),
+            ], axis=1).astype(np.int32))
+            missing = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count))
+            parts["missing_left"].append(np.asarray(missing, dtype=bool))
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, None]
+            normalizer[normalizer == 0.0] = 1.0
+            parts["value"].append(value / normalizer)
+
+        arrays = {name: np.concatenate(chunks) for name, chunks in parts.items()}
+        arrays["roots"] = roots
+        meta = {
+            "n_trees": len(trees),
+            "n_nodes": int(sum(sizes)),
+            "max_depth": int(max(tree.max_depth for tree in trees)),
+            "n_features": int(model.n_features_in_),
+            "classes": model.classes_.tolist(),
+            "source_sha1": file_sha1(source_path) if source_path else None,
+            "feature_encoding": getattr(model, "feature_encoding_", None),
+            "feature_names": getattr(model, "feature_names_", None),
+        }
+        return cls(arrays, meta)
+
+    def save(self, out_dir: str):
+        os.makedirs(out_dir, exist_ok=True)
+        for name, array in self.arrays.items():
+            np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(out_dir, META_FILE), "w") as f:
+            json.dump(self.meta, f, indent=1)
+
+    @classmethod
+    def load(cls, model_dir: str):
+        with open(os.path.join(model_dir, META_FILE)) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(model_dir, f"{name}.npy"), mmap_mode="r")
+                  for name in NODE_ARRAYS + ("roots",)}
+        return cls(arrays, meta)
+
+    # === Evaluation ===
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Global leaf index of every sample in every tree, shape (n_trees, n)."""
+        a = {name: np.asarray(array) for name, array in self.arrays.items()}
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat = X.ravel()
+        offsets = (np.arange(len(X), dtype=np.int64) * X.shape[1])[None, :]
+        check_missing = bool(np.isnan(flat).any())
+        nodes = np.repeat(np.asarray(a["roots"])[:, None], len(X), axis=1)
+        for _ in range(self.meta["max_depth"]):
+            x = flat[offsets + a["feature"][nodes]]
+            go_right = ~(x <= a["threshold"][nodes])
+            if check_missing:
+                go_right &= ~(np.isnan(x) & a["missing_left"][nodes])
+            nodes = a["children"][nodes, go_right.view(np.uint8)]
+        return nodes
+
+    def predict_proba(self, X: np.ndarray, batch_size: int = 8192, backend: str = None) -> np.ndarray:
+        """
+        Class probabilities, averaged over trees in tree order like
+        RandomForestClassifier.predict_proba with n_jobs=1.
+
+        `backend` is "numba" (default when installed) or "numpy", which
+        walks all trees for a batch of samples at once.
+        """
+        backend = backend or ("numba" if numba is not None else "numpy")
+        a = {name: np.asarray(array) for name, array in self.arrays.items()}
+        out = np.zeros((len(X), len(self.classes_)), dtype=np.float64)
+        if backend == "numba":
+            # uint8 bin codes are read as they are: a quarter of the float32 traffic
+            X = np.ascontiguousarray(X, dtype=np.uint8 if X.dtype == np.uint8 else np.float32)
+            _predict_numba(X, a["roots"], a["feature"],
+                           a["threshold"], a["children"], a["missing_left"], a["value"], out)
+        else:
+            for start in range(0, len(X), batch_size):
+                leaves = self.apply(X[start:start + batch_size])
+                batch = out[start:start + batch_size]
+                for tree_leaves in leaves:
+                    batch += a["value"][tree_leaves]
+        out /= self.meta["n_trees"]
+        return out
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+if numba is not None:
+    @numba.njit(nogil=True, cache=True)
+    def _predict_numba(X, roots, feature, threshold, children, missing_left, value, out):
+        """
+        Sum of leaf values over trees (in tree order) for every sample, into
+        `out`. Releases the GIL, so callers parallelise with threads.
+        """
+        for i in range(X.shape[0]):
+            for root in roots:
+                node = root
+                while children[node, 0] != node:
+                    x = X[i, feature[node]]
+                    go_left = x <= threshold[node] or (np.isnan(x) and missing_left[node])
+                    node = children[node, 0] if go_left else children[node, 1]
+                for c in range(value.shape[1]):
+                    out[i, c] += value[node, c]
+
+
+def load_model(model_path: str, compiled_dir: str = None):
+    """
+    The model to predict with: the compiled forest in `compiled_dir` when it
+    was exported from the current `model_path`, else the joblib model. A
+    compiled forest from an older (or unknown) model is never used.
+    """
+    if compiled_dir and os.path.exists(os.path.join(compiled_dir, META_FILE)):
+        forest = CompiledForest.load(compiled_dir)
+        if forest.meta.get("source_sha1") == file_sha1(model_path):
+            return forest
+        print(f"⚠️ {compiled_dir} was not exported from the current {model_path}; "
+              f"using the joblib model (re-run compiled_forest.py to refresh it)")
+    return joblib.load(model_path)
+
+
+def benchmark(model_path: str, compiled_dir: str, X: np.ndarray):
+    """Compare load time, pixels/s and predictions of sklearn and the compiled forest."""
+    start = time.perf_counter()
+    model = joblib.load(model_path)
+    sk_load = time.perf_counter() - start
+    model.n_jobs = 1  # tree-order accumulation, comparable to the compiled path
+
+    start = time.perf_counter()
+    forest = CompiledForest.load(compiled_dir)
+    cf_load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sk_proba = model.predict_proba(X)
+    sk_time = time.perf_counter() - start
+
+    print(f"\n📊 {forest.meta['n_trees']} trees, {forest.meta['n_nodes']} nodes, "
+          f"depth {forest.meta['max_depth']}, {len(X)} pixels")
+    print(f"  sklearn          load {sk_load * 1e3:8.1f} ms   {len(X) / sk_time:12,.0f} pixels/s")
+
+    backends = ["numpy"] + (["numba"] if numba is not None else [])
+    for backend in backends:
+        forest.predict_proba(X[:16], backend=backend)  # warm-up (JIT compile / cache load)
+        start = time.perf_counter()
+        cf_proba = forest.predict_proba(X, backend=backend)
+        cf_time = time.perf_counter() - start
+        print(f"  compiled {backend:<7} load {cf_load * 1e3:8.1f} ms   {len(X) / cf_time:12,.0f} pixels/s")
+        if np.array_equal(sk_proba, cf_proba):
+            print(f"✅ {backend} predictions match sklearn exactly")
+        else:
+            print(f"❌ {backend} max probability difference: {np.abs(sk_proba - cf_proba).max():.3g}")
+    return sk_proba
+
+
+if __name__ == "__main__":
+    # Paths
+    model_path   = "models/fullstack_rf.joblib"
+    compiled_dir = "models/fullstack_rf_compiled"
+    n_bench      = 200_000
+
+    # 1) Export
+    model = joblib.load(model_path)
+    forest = CompiledForest.from_sklearn(model, model_path)
+    forest.save(compiled_dir)
+    print("✅ Saved compiled forest to", compiled_dir)
+
+    # 2) Benchmark on random pixels spanning each feature's split thresholds
+    a = forest.arrays
+    split = a["children"][:, 0] != np.arange(forest.meta["n_nodes"])
+    low = np.full(forest.n_features_in_, np.inf)
+    high = np.full(forest.n_features_in_, -np.inf)
+    np.minimum.at(low, a["feature"][split], a["threshold"][split])
+    np.maximum.at(high, a["feature"][split], a["threshold"][split])
+    low[np.isinf(low)], high[np.isinf(high)] = 0.0, 1.0
+    span = high - low + 1e-6
+    rng = np.random.default_rng(42)
+    X = rng.uniform(low - 0.1 * span, high + 0.1 * span,
+                    size=(n_bench, forest.n_features_in_)).astype(np.float32)
+    benchmark(model_path, compiled_dir, X)
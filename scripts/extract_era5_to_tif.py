@@ -1,50 +1,235 @@
-import xarray as xr
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import rasterio
+import xarray as xr
+from rasterio.crs import CRS
 from rasterio.transform import from_origin
-import numpy as np
-import os
+
+from feature_store import FeatureStore
+
+try:
+    import dask
+except ImportError:  # optional: chunks are then loaded with plain NumPy
+    dask = None
 
 # Paths to your extracted files
 instant_nc = "data/raw/weather/data_stream-oper_stepType-instant.nc"
 accum_nc = "data/raw/weather/data_stream-oper_stepType-accum.nc"
 
+# Output name -> NetCDF variable; the names are the prefixes of the hourly files
+INSTANT_VARS = {"u10": "u10", "v10": "v10", "t2m": "t2m", "d2m": "d2m"}
+ACCUM_VARS = {"precip": "tp"}
+RAW_OUTPUTS = ["u10", "v10", "t2m", "precip"]  # what the hourly layout has always held
 
-# Output folder
-os.makedirs("data/processed/weather_tifs/", exist_ok=True)
 
-# Helper to export each hour of a variable as a tif
-def save_variable_as_tif(ds, var_name, output_prefix):
+def era5_grid(ds: xr.Dataset):
+    """(time coordinate name, transform, flip) of an ERA5 dataset, computed once."""
     time_coord = 'time' if 'time' in ds.coords else 'valid_time'
-    for i, t in enumerate(ds[time_coord]):
-        data = ds[var_name].isel({time_coord: i}).squeeze().values
-        lat = ds.latitude.values
-        lon = ds.longitude.values
-        transform = from_origin(lon.min(), lat.max(), abs(lon[1]-lon[0]), abs(lat[1]-lat[0]))
-        
-        # Flip lat axis if needed
-        if lat[0] < lat[-1]:
-            data = np.flipud(data)
-        
-        with rasterio.open(
-            f"data/processed/weather_tifs/{output_prefix}_{i:02d}.tif", "w",
-            driver="GTiff",
-            height=data.shape[0],
-            width=data.shape[1],
-            count=1,
-            dtype=data.dtype,
-            crs="EPSG:4326",
-            transform=transform
-        ) as dst:
-            dst.write(data, 1)
-
-# Open .nc files and extract variables
-ds_instant = xr.open_dataset(instant_nc)
-ds_accum = xr.open_dataset(accum_nc)
-
-# Save temperature, wind u/v
-save_variable_as_tif(ds_instant, "u10", "u10")         # 10m u-wind
-save_variable_as_tif(ds_instant, "v10", "v10")         # 10m v-wind
-save_variable_as_tif(ds_instant, "t2m", "t2m")         # 2m temperature
-
-# Save precipitation
-save_variable_as_tif(ds_accum, "tp", "precip")         # total precipitation
+    lat = ds.latitude.values
+    lon = ds.longitude.values
+    transform = from_origin(lon.min(), lat.max(), abs(lon[1] - lon[0]), abs(lat[1] - lat[0]))
+    return time_coord, transform, lat[0] < lat[-1]
+
+
+def relative_humidity(t2m, d2m):
+    """Relative humidity (%) from 2 m temperature and dewpoint in Kelvin (Magnus formula)."""
+    t, td = t2m - 273.15, d2m - 273.15
+    return 100 * np.exp(17.625 * td / (243.04 + td) - 17.625 * t / (243.04 + t))
+
+
+def output_names(ds: xr.Dataset, variables: dict, derived: bool = True) -> list:
+    """Names `era5_fields` returns for this dataset, without touching the data."""
+    names = [name for name, var in variables.items() if var in ds]
+    if derived and {"u10", "v10"} <= set(names):
+        names += ["wind_speed", "wind_dir"]
+    if derived and {"t2m", "d2m"} <= set(names):
+        names += ["rh"]
+    return names
+
+
+def era5_fields(ds: xr.Dataset, variables: dict, time_coord: str, derived: bool = True) -> dict:
+    """
+    {output name: (time, lat, lon) DataArray} for the variables present in
+    `ds`, plus the derived fields their inputs allow:
+    wind_speed (m/s) and wind_dir (degrees the wind blows from, clockwise
+    from north) from u10/v10, and rh (%) from t2m/d2m. Lazy when `ds` is
+    dask-backed.
+    """
+    fields = {}
+    for name, var in variables.items():
+        if var in ds:
+            da = ds[var]
+            extra = [d for d in da.dims if d not in (time_coord, "latitude", "longitude")]
+            fields[name] = da.squeeze(extra, drop=True).transpose(time_coord, "latitude", "longitude")
+    if derived and "u10" in fields and "v10" in fields:
+        u, v = fields["u10"], fields["v10"]
+        fields["wind_speed"] = np.hypot(u, v)
+        fields["wind_dir"] = np.degrees(np.arctan2(-u, -v)) % 360
+    if derived and "t2m" in fields and "d2m" in fields:
+        fields["rh"] = relative_humidity(fields["t2m"], fields["d2m"])
+    return fields
+
+
+def compute_chunk(fields: dict) -> dict:
+    """
+    Evaluate one time chunk of every field in a single pass. With dask the
+    graphs are merged, so each source variable is read once and the fields
+    are computed in parallel on dask's thread pool.
+    """
+    if dask is not None:
+        (fields,) = dask.compute(fields)
+    return {name: np.asarray(da.values, dtype=np.float32) for name, da in fields.items()}
+
+
+class _HourlyWriter:
+    """One single-band GeoTIFF per hour: <out_dir>/<name>_<index>.tif (the original layout)."""
+
+    def __init__(self, out_dir: str, profile: dict, pool: ThreadPoolExecutor):
+        self.out_dir = out_dir
+        self.profile = dict(profile, count=1)
+        self.pool = pool
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _write_var(self, name: str, frames: np.ndarray, start: int):
+        for i, frame in enumerate(frames, start=start):
+            with rasterio.open(os.path.join(self.out_dir, f"{name}_{i:02d}.tif"), "w",
+                               **self.profile) as dst:
+                dst.write(frame, 1)
+
+    def write(self, chunk: dict, start: int, times: list):
+        list(self.pool.map(lambda item: self._write_var(item[0], item[1], start), chunk.items()))
+
+    def close(self):
+        pass
+
+
+class _MultibandWriter:
+    """One GeoTIFF per variable, one band per hour (band description = timestamp)."""
+
+    def __init__(self, out_dir: str, profile: dict, names: list, n_times: int,
+                 pool: ThreadPoolExecutor):
+        os.makedirs(out_dir, exist_ok=True)
+        self.pool = pool
+        self.paths = {name: os.path.join(out_dir, f"{name}.tif") for name in names}
+        band_profile = dict(profile, count=n_times, tiled=True, interleave="band",
+                            compress="deflate", bigtiff="IF_SAFER")
+        self.files = {name: rasterio.open(path, "w", **band_profile)
+                      for name, path in self.paths.items()}
+
+    def _write_var(self, name: str, frames: np.ndarray, start: int, times: list):
+        dst = self.files[name]
+        dst.write(frames, indexes=list(range(start + 1, start + len(frames) + 1)))
+        for band, timestamp in enumerate(times, start=start + 1):
+            dst.set_band_description(band, timestamp)
+
+    def write(self, chunk: dict, start: int, times: list):
+        list(self.pool.map(lambda item: self._write_var(item[0], item[1], start, times),
+                           chunk.items()))
+
+    def close(self):
+        for dst in self.files.values():
+            dst.close()
+
+
+class _StoreWriter:
+    """Hourly frames as dated features <name>_<HH> of a FeatureStore, e.g. t2m_07 on 2021-04-19."""
+
+    def __init__(self, store: FeatureStore):
+        self.store = store
+
+    def write(self, chunk: dict, start: int, times: list):
+        by_date = {}
+        for k, timestamp in enumerate(times):
+            date, hour = timestamp[:10], int(timestamp[11:13])
+            features = by_date.setdefault(date, {})
+            for name, frames in chunk.items():
+                features[f"{name}_{hour:02d}"] = frames[k]
+        for date, features in by_date.items():
+            self.store.append_date(date, features)
+
+    def close(self):
+        pass
+
+
+def export_era5(nc_path: str,
+                variables: dict,
+                mode: str = "multiband",
+                out_dir: str = "data/processed/weather_stack",
+                store_dir: str = "data/processed/feature_store",
+                outputs: list = None,
+                chunk_hours: int = 24,
+                n_threads: int = 4) -> list:
+    """
+    Export an ERA5 NetCDF in one streaming pass over time chunks.
+
+    The dataset is opened lazily, chunked by `chunk_hours` along time when
+    dask is installed; each time chunk of every output (raw and derived) is
+    evaluated together, then written per variable in parallel. The grid is
+    worked out once up front. Memory is one chunk of every output. `mode` is:
+      "hourly"    - <out_dir>/<name>_<index>.tif, one file per hour
+      "multiband" - <out_dir>/<name>.tif with one band per hour
+      "store"     - dated features <name>_<HH> in the feature store
+    `outputs` restricts which fields are written. Returns the names written.
+    """
+    with xr.open_dataset(nc_path) as probe:
+        time_coord, transform, flip = era5_grid(probe)
+    chunks = {time_coord: chunk_hours} if dask is not None else None
+    ds = xr.open_dataset(nc_path, chunks=chunks)
+    names = [name for name in output_names(ds, variables) if outputs is None or name in outputs]
+    n_times = ds.sizes[time_coord]
+    times = [str(t) for t in ds[time_coord].values.astype("datetime64[h]")]
+    H, W = ds.sizes["latitude"], ds.sizes["longitude"]
+    profile = {"driver": "GTiff", "height": H, "width": W, "dtype": "float32",
+               "crs": CRS.from_epsg(4326), "transform": transform}
+
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        if mode == "hourly":
+            writer = _HourlyWriter(out_dir, profile, pool)
+        elif mode == "multiband":
+            writer = _MultibandWriter(out_dir, profile, names, n_times, pool)
+        elif mode == "store":
+            store = FeatureStore.open_or_create(store_dir, profile)
+            if store.shape != (H, W):
+                raise ValueError(f"ERA5 grid is {H}x{W}, store grid is {store.shape}")
+            writer = _StoreWriter(store)
+        else:
+            raise ValueError(f"Unknown mode {mode!r}, expected 'hourly', 'multiband' or 'store'")
+
+        try:
+            for start in range(0, n_times, chunk_hours):
+                window = slice(start, start + chunk_hours)
+                source = ds.isel({time_coord: window})
+                if dask is None:
+                    source = source.load()  # read every variable of the chunk once
+                fields = era5_fields(source, variables, time_coord)
+                chunk = compute_chunk({name: fields[name] for name in names})
+                if flip:
+                    chunk = {name: np.ascontiguousarray(frames[:, ::-1])
+                             for name, frames in chunk.items()}
+                writer.write(chunk, start, times[window])
+        finally:
+            writer.close()
+            ds.close()
+    return names
+
+
+if __name__ == "__main__":
+    # Settings
+    mode        = "hourly"   # "hourly" (weather_tifs/<var>_HH.tif, read by the other scripts) | "multiband" | "store"
+    out_dir     = "data/processed/weather_tifs" if mode == "hourly" else "data/processed/weather_stack"
+    store_dir   = "data/processed/feature_store"
+    chunk_hours = 24
+    n_threads   = 4
+    # The hourly layout keeps its four raw variables; the others add wind speed/direction and RH
+    outputs     = RAW_OUTPUTS if mode == "hourly" else None
+
+    start = time.perf_counter()
+    for nc_path, variables in ((instant_nc, INSTANT_VARS), (accum_nc, ACCUM_VARS)):
+        names = export_era5(nc_path, variables, mode=mode, out_dir=out_dir, store_dir=store_dir,
+                            outputs=outputs, chunk_hours=chunk_hours, n_threads=n_threads)
+        print(f"✅ Exported {', '.join(names)} from {nc_path}")
+    target = store_dir if mode == "store" else out_dir
+    print(f"⏱️ ERA5 export ({mode}) to {target} in {time.perf_counter() - start:.1f}s")
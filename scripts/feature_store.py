@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from rasterio.crs import CRS
+from rasterio.transform import Affine
+from rasterio.windows import Window
+
+META_FILE = "store.json"
+MISSING_CODE = 255  # uint8 bin code for missing values in quantized stores
+
+
+def missing_mask(block: np.ndarray) -> np.ndarray:
+    """Missing values in a feature block: NaN for floats, MISSING_CODE for uint8 bin codes."""
+    if block.dtype == np.uint8:
+        return block == MISSING_CODE
+    return np.isnan(block)
+
+
+class FeatureStore:
+    """
+    On-disk feature cube: one raw .npy file per feature plus a JSON index.
+
+    Every feature is an (H, W) array on the same grid, stored as its own
+    .npy so it can be memory-mapped; reading a window or a subset of
+    features only touches those bytes. Features carry a name (e.g.
+    "t2m_07", "dem") and an optional date; dated features are appended per
+    day, undated ones are static layers shared by every date.
+
+    Layout:
+        <root>/store.json                 grid + feature index
+        <root>/static/<name>.npy          undated features
+        <root>/<date>/<name>.npy          dated features
+        <root>/bin_edges.npy              quantized stores only (see quantize_features.py)
+
+    A quantized store holds uint8 bin codes instead of float32 values;
+    its index records the bin edges per feature under "bins".
+    """
+
+    def __init__(self, root: str, meta: dict):
+        self.root = root
+        self.meta = meta
+
+    # === Creating / opening ===
+    @classmethod
+    def create(cls, root: str, profile: dict):
+        """Start an empty store on the grid described by a rasterio profile."""
+        os.makedirs(root, exist_ok=True)
+        meta = {
+            "height": profile["height"],
+            "width": profile["width"],
+            "crs": profile["crs"].to_wkt() if profile.get("crs") else None,
+            "transform": list(profile["transform"])[:6],
+            "features": [],
+        }
+        store = cls(root, meta)
+        store._save_meta()
+        return store
+
+    @classmethod
+    def open(cls, root: str):
+        with open(os.path.join(root, META_FILE)) as f:
+            return cls(root, json.load(f))
+
+    @classmethod
+    def open_or_create(cls, root: str, profile: dict):
+        if os.path.exists(os.path.join(root, META_FILE)):
+            return cls.open(root)
+        return cls.create(root, profile)
+
+    def _save_meta(self):
+        tmp_path = os.path.join(self.root, META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(tmp_path, os.path.join(self.root, META_FILE))
+
+    # === Grid ===
+    @property
+    def shape(self) -> tuple:
+        return self.meta["height"], self.meta["width"]
+
+    @property
+    def profile(self) -> dict:
+        """A rasterio profile for writing rasters on the store's grid."""
+        return {
+            "driver": "GTiff",
+            "height": self.meta["height"],
+            "width": self.meta["width"],
+            "count": 1,
+            "crs": CRS.from_wkt(self.meta["crs"]) if self.meta["crs"] else None,
+            "transform": Affine(*self.meta["transform"]),
+        }
+
+    @property
+    def quantized(self) -> bool:
+        return "bins" in self.meta
+
+    @property
+    def dtype(self):
+        """Natural dtype of a block: uint8 bin codes if quantized, else float32."""
+        return np.dtype(np.uint8) if self.quantized else np.dtype(np.float32)
+
+    def bin_edges(self, names: list) -> np.ndarray:
+        """(F, n_bins - 1) upper bin edges of the named features, +inf padded."""
+        edges = np.load(os.path.join(self.root, self.meta["bins"]["file"]))
+        index = self.meta["bins"]["names"]
+        return edges[[index.index(name) for name in names]]
+
+    def feature_encoding(self, names: list) -> dict:
+        """
+        What a model trained on these features was fed: {"dtype": "float32"},
+        or for a quantized store {"dtype": "uint8"} plus a hash of the
+        features' bin edges. Saved with models as `feature_encoding_`.
+        """
+        if not self.quantized:
+            return {"dtype": "float32"}
+        edges = np.ascontiguousarray(self.bin_edges(names), dtype=np.float32)
+        return {"dtype": "uint8", "bin_edges_sha1": hashlib.sha1(edges.tobytes()).hexdigest()}
+
+    def check_model(self, model, names: list):
+        """
+        Raise ValueError unless `model` was trained on these features, in
+        this order (its `feature_names_`), as this store encodes them
+        (float32 values or the same uint8 bin codes). Models saved without a
+        `feature_encoding_` count as float32; without `feature_names_` the
+        order cannot be checked.
+        """
+        trained_names = getattr(model, "feature_names_", None)
+        if trained_names is not None and list(trained_names) != list(names):
+            if len(trained_names) != len(names):
+                raise ValueError(f"Model was trained on {len(trained_names)} features, "
+                                 f"but {self.root} gives {len(names)}")
+            i = next(i for i, (a, b) in enumerate(zip(trained_names, names)) if a != b)
+            raise ValueError(f"Feature {i} is {names[i]!r} in {self.root}, "
+                             f"but the model was trained with {trained_names[i]!r} there")
+        trained = getattr(model, "feature_encoding_", None) or {"dtype": "float32"}
+        expected = self.feature_encoding(names)
+        if trained != expected:
+            raise ValueError(f"Model was trained on {trained['dtype']} features, but {self.root} "
+                             f"holds {expected['dtype']} features"
+                             + (" with different bin edges" if trained["dtype"] == expected["dtype"]
+                                else ""))
+
+    # === Feature index ===
+    def _entry(self, name: str, date: str = None):
+        for entry in self.meta["features"]:
+            if entry["name"] == name and entry["date"] == date:
+                return entry
+        return None
+
+    def dates(self) -> list:
+        return sorted({e["date"] for e in self.meta["features"] if e["date"] is not None})
+
+    def feature_names(self, date: str = None, include_static: bool = True) -> list:
+        """Names of the features available for `date` (dated first, then static), in insertion order."""
+        names = [e["name"] for e in self.meta["features"] if date is not None and e["date"] == date]
+        if include_static:
+            names += [e["name"] for e in self.meta["features"] if e["date"] is None]
+        return names
+
+    # === Writing ===
+    def create_feature(self, name: str, dtype=np.float32, date: str = None,
+                       save_meta: bool = True) -> np.memmap:
+        """
+        Allocate a feature on disk and return a writable memmap, so large
+        features can be filled window by window. An existing feature with
+        the same name and date is replaced. With save_meta=False the index
+        is only updated in memory; call `_save_meta` once after a batch.
+        """
+        folder = date if date is not None else "static"
+        rel_path = os.path.join(folder, f"{name}.npy")
+        os.makedirs(os.path.join(self.root, folder), exist_ok=True)
+        array = np.lib.format.open_memmap(os.path.join(self.root, rel_path), mode="w+",
+                                          dtype=np.dtype(dtype), shape=self.shape)
+        entry = self._entry(name, date)
+        if entry is None:
+            self.meta["features"].append({"name": name, "date": date, "file": rel_path,
+                                          "dtype": np.dtype(dtype).str})
+        else:
+            entry.update(file=rel_path, dtype=np.dtype(dtype).str)
+        if save_meta:
+            self._save_meta()
+        return array
+
+    def write_feature(self, name: str, data: np.ndarray, date: str = None,
+                      save_meta: bool = True):
+        """Store a whole (H, W) array as a feature."""
+        if data.shape != self.shape:
+            raise ValueError(f"Feature {name} has shape {data.shape}, store grid is {self.shape}")
+        array = self.create_feature(name, data.dtype, date, save_meta)
+        array[:] = data
+        array.flush()
+
+    def append_date(self, date: str, features: dict):
+        """Add one day of dated features ({name: (H, W) array}); the index is saved once."""
+        for name, data in features.items():
+            self.write_feature(name, data, date, save_meta=False)
+        self._save_meta()
+
+    # === Reading ===
+    def feature(self, name: str, date: str = None) -> np.ndarray:
+        """Read-only memmap of one feature (falls back to the static layer)."""
+        entry = self._entry(name, date) or self._entry(name, None)
+        if entry is None:
+            raise KeyError(f"No feature {name!r} for date {date!r}")
+        return np.load(os.path.join(self.root, entry["file"]), mmap_mode="r")
+
+    def read(self, names: list = None, window: Window = None, date: str = None,
+             dtype=None) -> np.ndarray:
+        """
+        Read a (h, w, F) block of features. Only the requested window of the
+        requested features is pulled from disk. `dtype` defaults to the
+        store's own (float32, or uint8 codes for a quantized store).
+        """
+        dtype = dtype or self.dtype
+        names = names if names is not None else self.feature_names(date)
+        rows, cols = window.toslices() if window is not None else (slice(None), slice(None))
+        first = self.feature(names[0], date)[rows, cols]
+        out = np.empty(first.shape + (len(names),), dtype=dtype)
+        out[..., 0] = first
+        for k, name in enumerate(names[1:], start=1):
+            out[..., k] = self.feature(name, date)[rows, cols]
+        return out
+
+    def windows(self, block_size: int = 512):
+        """Yield the row-major blocks of the grid."""
+        height, width = self.shape
+        for row in range(0, height, block_size):
+            for col in range(0, width, block_size):
+                yield Window(col, row, min(block_size, width - col), min(block_size, height - row))
+
+    def iter_blocks(self, names: list = None, date: str = None, block_size: int = 512,
+                    dtype=None):
+        """Stream (window, (h, w, F) features) over the whole grid."""
+        for window in self.windows(block_size):
+            yield window, self.read(names, window, date, dtype)
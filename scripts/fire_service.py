@@ -0,0 +1,326 @@
+# scripts/fire_service.py
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import rasterio
+from rasterio.errors import RasterioIOError, WindowError
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window, from_bounds
+
+from compiled_forest import load_model
+from feature_store import MISSING_CODE, FeatureStore, missing_mask
+from fire_spread_simulation import spread_one_hour_static, tile_rng
+from quantize_features import quantize
+from static_factors import load_static_factors
+
+
+MAX_SPREAD_HOURS = 72  # longest spread a request may ask for; each hour is one CA step
+
+
+def _int_field(request: dict, key: str, default: int, low: int, high: int) -> int:
+    """An integer request field in [low, high]; anything else is a ValueError (HTTP 400)."""
+    value = request.get(key, default)
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{key} must be an integer, got {value!r}")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer, got {value!r}") from None
+    if not low <= number <= high:
+        raise ValueError(f"{key} must be between {low} and {high}, got {number}")
+    return number
+
+
+class _Batcher:
+    """
+    Collects pixel matrices from concurrent requests and scores them with
+    one predict_proba call. A batch closes after `max_wait_ms` or once it
+    holds `max_batch_pixels` pixels.
+    """
+
+    def __init__(self, model, max_batch_pixels: int = 1 << 20, max_wait_ms: float = 5.0):
+        self.model = model
+        self.fire_col = list(model.classes_).index(1)
+        self.max_batch_pixels = max_batch_pixels
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = deque(maxlen=10_000)
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, pixels: np.ndarray) -> Future:
+        future = Future()
+        self._queue.put((pixels, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            n_pixels = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while n_pixels < self.max_batch_pixels:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n_pixels += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch: list):
+        try:
+            pixels = np.concatenate([p for p, _ in batch])
+            valid = ~missing_mask(pixels).any(axis=1)
+            prob = np.full(len(pixels), np.nan, dtype=np.float32)
+            if valid.any():
+                prob[valid] = self.model.predict_proba(pixels[valid])[:, self.fire_col]
+        except Exception as err:
+            for _, future in batch:
+                future.set_exception(err)
+            return
+        self.batch_sizes.append(len(batch))
+        start = 0
+        for p, future in batch:
+            future.set_result(prob[start:start + len(p)])
+            start += len(p)
+
+
+class FireService:
+    """
+    Fire prediction and spread on request, with everything static resident.
+
+    The model, the static features of the store (DEM, fuel, built-up) and
+    the spread susceptibility are loaded once. A request names a bbox on
+    the store grid and its weather: a date already in the store, a
+    multi-band weather GeoTIFF (bands in the store's weather feature
+    order) or an inline (F, h, w) array. Pixels from concurrent requests
+    are scored together by a `_Batcher`. On a quantized store the model
+    sees uint8 bin codes: file and inline weather is binned with the
+    store's edges, and spread wind is read back from the bin edges.
+    """
+
+    def __init__(self,
+                 store: FeatureStore,
+                 model,
+                 susceptibility: np.ndarray,
+                 directional: np.ndarray = None,
+                 threshold: float = 0.5,
+                 **batch_kwargs):
+        if susceptibility.shape != store.shape:
+            raise ValueError(f"Static factors {susceptibility.shape} do not match "
+                             f"the store grid {store.shape}")
+        if not store.dates():
+            raise ValueError(f"{store.root} has no dated weather features to serve")
+        self.store = store
+        self.threshold = threshold
+        self.static_names = store.feature_names(None)
+        self.static = np.stack([np.array(store.feature(n)) for n in self.static_names], axis=-1)
+        self.weather_names = store.feature_names(store.dates()[-1], include_static=False)
+        store.check_model(model, self.weather_names + self.static_names)
+        self.weather_edges = store.bin_edges(self.weather_names) if store.quantized else None
+        self.susceptibility = np.array(susceptibility)
+        self.directional = None if directional is None else np.array(directional)
+        self.batcher = _Batcher(model, **batch_kwargs)
+        self.latencies = deque(maxlen=10_000)
+        self._lock = threading.Lock()
+
+    # === Request handling ===
+    def _window(self, bbox) -> Window:
+        H, W = self.store.shape
+        if bbox is None:
+            return Window(0, 0, W, H)
+        if len(bbox) != 4:
+            raise ValueError(f"bbox must be [minx, miny, maxx, maxy], got {bbox}")
+        window = from_bounds(*bbox, transform=self.store.profile["transform"])
+        window = window.round_offsets().round_lengths()
+        try:
+            window = window.intersection(Window(0, 0, W, H))
+        except WindowError:
+            raise ValueError(f"bbox {bbox} does not overlap the store grid") from None
+        if window.width < 1 or window.height < 1:
+            raise ValueError(f"bbox {bbox} covers no whole store cell")
+        return window
+
+    def _weather(self, request: dict, window: Window) -> np.ndarray:
+        """(h, w, F) weather features for the window."""
+        if "weather" in request:
+            weather = np.asarray(request["weather"], dtype=np.float32)
+            expected = (len(self.weather_names), window.height, window.width)
+            if weather.shape != expected:
+                raise ValueError(f"Inline weather has shape {weather.shape}, expected {expected}")
+            return np.moveaxis(weather, 0, -1)
+        if "weather_path" in request:
+            profile = self.store.profile
+            with rasterio.open(request["weather_path"]) as src, \
+                    WarpedVRT(src, crs=profile["crs"], transform=profile["transform"],
+                              width=profile["width"], height=profile["height"]) as vrt:
+                if vrt.count != len(self.weather_names):
+                    raise ValueError(f"{request['weather_path']} has {vrt.count} bands, "
+                                     f"expected {len(self.weather_names)}")
+                data = vrt.read(window=window, masked=True).astype(np.float32).filled(np.nan)
+            return np.moveaxis(data, 0, -1)
+        if "date" not in request:
+            raise ValueError("Request needs one of 'date', 'weather_path' or 'weather'")
+        return self.store.read(self.weather_names, window, request["date"])
+
+    def _as_codes(self, weather: np.ndarray) -> np.ndarray:
+        """Weather in the store's encoding: float values binned when the store is quantized."""
+        if self.weather_edges is None or weather.dtype == np.uint8:
+            return weather
+        return np.stack([quantize(weather[..., f], edges)
+                         for f, edges in enumerate(self.weather_edges)], axis=-1)
+
+    def _as_values(self, weather: np.ndarray, f: int) -> np.ndarray:
+        """
+        Float values of weather feature f. Bin codes map to their bin's lower
+        edge, except code 0, which is unbounded below and maps to its upper edge.
+        """
+        values = weather[..., f]
+        if values.dtype != np.uint8:
+            return np.nan_to_num(values)
+        edges = self.weather_edges[f]
+        lower = edges[np.clip(values.astype(np.int64) - 1, 0, len(edges) - 1)]
+        return np.nan_to_num(np.where(values == MISSING_CODE, 0, lower), posinf=0.0)
+
+    def predict(self, request: dict) -> dict:
+        if request.get("mode") == "spread":
+            hours = _int_field(request, "hours", 12, 1, MAX_SPREAD_HOURS)
+            seed = _int_field(request, "seed", 42, 0, 2 ** 63 - 1)
+        window = self._window(request.get("bbox"))
+        weather = self._weather(request, window)
+        features = np.concatenate([self._as_codes(weather), self.static[window.toslices()]], axis=-1)
+        prob = self.batcher.submit(features.reshape(-1, features.shape[-1])).result()
+        prob = prob.reshape(window.height, window.width)
+        response = {"window": [window.col_off, window.row_off, window.width, window.height],
+                    "probability": np.where(np.isnan(prob), None, prob.round(4)).tolist()}
+
+        if request.get("mode") == "spread":
+            response["arrival_hour"] = self._spread(prob >= self.threshold, weather, window,
+                                                    hours, seed).tolist()
+        return response
+
+    def _spread(self, ignition: np.ndarray, weather: np.ndarray, window: Window,
+                hours: int, seed: int) -> np.ndarray:
+        """
+        CA spread from the predicted fire within the window, using the hourly
+        u10/v10 weather features as wind. Hour h uses frame u10_<h> (the last
+        frame once they run out), as the CLI drivers do. Returns the first
+        hour each cell burned (0 = predicted fire, -1 = never).
+        """
+        index = {name: k for k, name in enumerate(self.weather_names)}
+        by_hour = lambda name: int(name.split("_")[1])  # u10_100 after u10_99
+        u_names = sorted((n for n in self.weather_names if re.fullmatch(r"u10_\d+", n)), key=by_hour)
+        v_names = sorted((n for n in self.weather_names if re.fullmatch(r"v10_\d+", n)), key=by_hour)
+        if not u_names or len(u_names) != len(v_names):
+            raise ValueError("Spread needs matching u10_HH/v10_HH weather features")
+        rows, cols = window.toslices()
+        susceptibility = self.susceptibility[rows, cols]
+        directional = None if self.directional is None else self.directional[:, rows, cols]
+
+        mask = ignition.astype(np.uint8)
+        arrival = np.where(ignition, 0, -1).astype(np.int16)
+        for hour in range(1, hours + 1):
+            k = min(hour, len(u_names) - 1)  # as wind.frame(hour) in the CLI drivers
+            wind_u = self._as_values(weather, index[u_names[k]])
+            wind_v = self._as_values(weather, index[v_names[k]])
+            mask |= spread_one_hour_static(mask, wind_u, wind_v, susceptibility, directional,
+                                           rng=tile_rng(seed, hour, 0))
+            arrival[(mask == 1) & (arrival < 0)] = hour
+        return arrival
+
+    # === Latency stats ===
+    def record(self, seconds: float):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+        batches = np.array(self.batcher.batch_sizes)
+        if latencies.size == 0:
+            return {"requests": 0}
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        return {"requests": int(latencies.size),
+                "p50_ms": round(p50, 2), "p90_ms": round(p90, 2), "p99_ms": round(p99, 2),
+                "max_ms": round(latencies.max(), 2),
+                "mean_requests_per_batch": round(float(batches.mean()), 2) if batches.size else 0}
+
+
+def make_handler(service: FireService):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, service.stats())
+            elif self.path == "/health":
+                self._reply(200, {"status": "ok", "grid": list(service.store.shape)})
+            else:
+                self._reply(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._reply(404, {"error": f"unknown path {self.path}"})
+                return
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                response = service.predict(json.loads(self.rfile.read(length)))
+            except (ValueError, KeyError, WindowError) as err:
+                self._reply(400, {"error": str(err.args[0]) if err.args else repr(err)})
+                return
+            except RasterioIOError as err:
+                self._reply(400, {"error": f"Cannot read weather_path: {err}"})
+                return
+            except Exception as err:  # model or internal failure: report it, keep serving
+                traceback.print_exc()
+                self._reply(500, {"error": f"{type(err).__name__}: {err}"})
+                return
+            service.record(time.perf_counter() - start)
+            self._reply(200, response)
+
+        def log_message(self, format, *args):
+            pass  # keep the console for startup and errors
+
+    return Handler
+
+
+if __name__ == "__main__":
+    # Paths
+    store_dir  = "data/processed/feature_store"
+    model_in   = "models/fullstack_rf.joblib"
+    compiled   = "models/fullstack_rf_compiled"
+    slope_path = "data/processed/terrain/dem_slope_11x13.tif"
+    fuel_path  = "data/processed/fuel/fuel_binary_11x13.tif"
+
+    # Settings (local only)
+    host, port = "127.0.0.1", 8765
+
+    store = FeatureStore.open(store_dir)
+    model = load_model(model_in, compiled)
+    susceptibility, directional = load_static_factors(slope_path, fuel_path)
+    service = FireService(store, model, susceptibility, directional)
+
+    # Example:
+    #   curl -s localhost:8765/predict -d '{"date": "2021-04-19", "mode": "spread", "hours": 6}'
+    #   ("hours" is 1 to MAX_SPREAD_HOURS, "seed" a non-negative integer)
+    #   curl -s localhost:8765/stats
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"🚀 Serving fire predictions on http://{host}:{port} "
+          f"({len(service.weather_names)} weather + {len(service.static_names)} static features)")
+    server.serve_forever()
@@ -0,0 +1,108 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+
+from fire_spread_simulation import spread_one_hour_static
+from spread_output import write_cog
+from static_factors import load_static_factors
+from wind_field import WindField
+
+
+def _run_batch(initial_mask: np.ndarray,
+               wind_frames: list,
+               susceptibility: np.ndarray,
+               directional: np.ndarray,
+               n_realizations: int,
+               seed_seq: np.random.SeedSequence,
+               ignition_prob: float = 0.3) -> np.ndarray:
+    """
+    Run `n_realizations` CA realizations as one (N, H, W) array computation.
+    Returns per-timestep burn counts with shape (T, H, W).
+    """
+    rng = np.random.default_rng(seed_seq)
+    masks = np.repeat(initial_mask[None, :, :], n_realizations, axis=0).astype(np.uint8)
+    counts = np.zeros((len(wind_frames),) + initial_mask.shape, dtype=np.uint32)
+
+    for t, (wind_u, wind_v) in enumerate(wind_frames):
+        masks |= spread_one_hour_static(masks, wind_u, wind_v, susceptibility, directional,
+                                        ignition_prob, rng=rng)
+        counts[t] = masks.sum(axis=0, dtype=np.uint32)
+    return counts
+
+
+def run_ensemble(initial_mask: np.ndarray,
+                 wind_frames: list,
+                 susceptibility: np.ndarray,
+                 directional: np.ndarray = None,
+                 n_realizations: int = 1000,
+                 batch_size: int = 100,
+                 n_workers: int = 1,
+                 seed: int = 42,
+                 ignition_prob: float = 0.3) -> np.ndarray:
+    """
+    Monte-Carlo burn probabilities over `n_realizations` CA runs.
+
+    Realizations are split into batches of `batch_size`, each with its own
+    child seed, so results depend only on `seed` and `batch_size`, never on
+    `n_workers`. Static layers come precomputed (see static_factors.py), so
+    members only evaluate the wind term. Returns float32 probabilities with
+    shape (T, H, W).
+    """
+    sizes = [min(batch_size, n_realizations - start)
+             for start in range(0, n_realizations, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(initial_mask, wind_frames, susceptibility, directional, n, s, ignition_prob)
+            for n, s in zip(sizes, seeds)]
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            batch_counts = list(pool.map(_run_batch, *zip(*args)))
+    else:
+        batch_counts = [_run_batch(*a) for a in args]
+
+    counts = np.sum(batch_counts, axis=0, dtype=np.uint64)
+    return (counts / n_realizations).astype(np.float32)
+
+
+if __name__ == "__main__":
+    # === File paths ===
+    mask_path = 'data/processed/fire_labels/fire_20210419_downsampled_11x13.tif'
+    timesteps = [1, 2, 3, 6, 12]
+    weather_dir = 'data/processed/weather_tifs'
+    slope_path = 'data/processed/terrain/dem_slope_11x13.tif'
+    fuel_path = 'data/processed/fuel/fuel_binary_11x13.tif'
+
+    # === Ensemble settings ===
+    n_realizations = 1000
+    batch_size = 100
+    n_workers = os.cpu_count() or 1
+    seed = 42
+
+    # === Load input layers ===
+    with rasterio.open(mask_path) as src:
+        profile = src.profile
+        pred_mask = src.read(1).astype(np.uint8)
+    susceptibility, directional = load_static_factors(slope_path, fuel_path)
+
+    # One wind frame per simulated hour, interpolated from the ERA5 series
+    wind = WindField.from_tifs(weather_dir, profile)
+    wind_frames = [wind.frame(h) for h in range(1, max(timesteps) + 1)]
+
+    # === Run ensemble ===
+    start = time.perf_counter()
+    burn_prob = run_ensemble(pred_mask, wind_frames, susceptibility, directional,
+                             n_realizations=n_realizations, batch_size=batch_size,
+                             n_workers=n_workers, seed=seed)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ {n_realizations} realizations in {elapsed:.2f}s "
+          f"({n_realizations / elapsed:.1f} realizations/s, {n_workers} workers)")
+
+    # === Save per-hour burn probability rasters ===
+    profile.update(dtype=rasterio.float32, count=1, nodata=None)
+    for hour in timesteps:
+        out_path = f'outputs/burn_probability_t_plus_{hour}h.tif'
+        write_cog(out_path, burn_prob[hour - 1], profile, overview_resampling="average")
+        print(f"✅ Saved t+{hour}h burn probability raster to {out_path}")
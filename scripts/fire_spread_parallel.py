@@ -0,0 +1,225 @@
+import os
+import time
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+import rasterio
+
+from fire_spread_simulation import NEIGHBORS, spread_one_hour_static, static_susceptibility, tile_rng
+from fire_spread_tiled import BURNING, IGNITING, _freeze_halo
+from spread_output import SpreadWriter
+from static_factors import load_static_factors
+from wind_field import WindField
+
+# Views onto the shared layers inside each worker process
+_shared = {}
+_attached = []
+
+
+class SharedLayers:
+    """
+    Named (H, W) arrays backed by `multiprocessing.shared_memory`, so worker
+    processes can read and write them without anything being pickled.
+    """
+
+    def __init__(self, shape: tuple, dtypes: dict):
+        self.shape = shape
+        self.blocks = {}
+        self.arrays = {}
+        for name, dtype in dtypes.items():
+            dtype = np.dtype(dtype)
+            shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * dtype.itemsize)
+            self.blocks[name] = (shm, dtype)
+            self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    @property
+    def spec(self) -> dict:
+        """What a worker needs to attach: {name: (block name, dtype string)}."""
+        return {name: (shm.name, dtype.str) for name, (shm, dtype) in self.blocks.items()}
+
+    def close(self):
+        self.arrays.clear()
+        for shm, _ in self.blocks.values():
+            shm.close()
+            shm.unlink()
+
+
+def _attach(spec: dict, shape: tuple):
+    """Pool initializer: map every shared layer into this worker."""
+    for name, (block, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=block)
+        _attached.append(shm)
+        _shared[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _spread_band(band_id: int, row0: int, row1: int, step: int,
+                 seed: int, ignition_prob: float) -> bool:
+    """
+    Spread within rows [row0, row1) using a one-row halo from the bands
+    above and below. The halo only contributes burning sources, and
+    ignitions are staged as IGNITING, so the outcome does not depend on
+    which neighbouring bands have already run. Returns True if anything
+    ignited.
+    """
+    state = _shared["state"]
+    halo0, halo1 = max(row0 - 1, 0), min(row1 + 1, state.shape[0])
+    inner = slice(row0 - halo0, row1 - halo0)
+    current = _freeze_halo(state[halo0:halo1].copy(), inner)
+    if not (current == BURNING).any():
+        return False
+
+    rows = slice(halo0, halo1)
+    directional = None
+    if "directional_0" in _shared:
+        directional = [_shared[f"directional_{k}"][rows] for k in range(len(NEIGHBORS))]
+    new_ignitions = spread_one_hour_static(
+        current, _shared["wind_u"][rows], _shared["wind_v"][rows],
+        _shared["susceptibility"][rows], directional,
+        ignition_prob=ignition_prob, rng=tile_rng(seed, step, band_id))[inner]
+    band = state[row0:row1]
+    band[new_ignitions == 1] = IGNITING
+    return bool(new_ignitions.any())
+
+
+def _commit_band(row0: int, row1: int) -> bool:
+    """Turn this step's staged ignitions into burning cells."""
+    band = _shared["state"][row0:row1]
+    band[band == IGNITING] = BURNING
+    return True
+
+
+def _band_bounds(height: int, band_rows: int) -> list:
+    return [(i, row0, min(row0 + band_rows, height))
+            for i, row0 in enumerate(range(0, height, band_rows))]
+
+
+def simulate_parallel(initial_mask: np.ndarray,
+                      wind_frames: list,
+                      susceptibility: np.ndarray,
+                      directional: np.ndarray = None,
+                      n_workers: int = None,
+                      band_rows: int = 256,
+                      seed: int = 42,
+                      ignition_prob: float = 0.3,
+                      save_hours: list = None) -> dict:
+    """
+    Row-band parallel CA spread over a shared-memory state grid.
+
+    The burn state, static susceptibility and the optional (8, H, W)
+    slope-aspect factors (see static_factors.py) are placed in shared
+    memory once; each step only the wind frame is copied in and workers
+    receive nothing but band bounds. Bands draw from
+    `tile_rng(seed, step, band_id)`, so for a fixed `band_rows` the result
+    is identical for any `n_workers`. `wind_frames` may be a generator
+    (one frame per hour). Returns {hour: cumulative mask} for the hours in
+    `save_hours` (1-based frame counts); by default only the final hour.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    dtypes = {"state": np.uint8, "susceptibility": np.float32,
+              "wind_u": np.float32, "wind_v": np.float32}
+    if directional is not None:
+        dtypes.update({f"directional_{k}": np.float32 for k in range(len(NEIGHBORS))})
+    layers = SharedLayers(initial_mask.shape, dtypes)
+    try:
+        layers["state"][:] = initial_mask == 1
+        layers["susceptibility"][:] = susceptibility
+        if directional is not None:
+            for k in range(len(NEIGHBORS)):
+                layers[f"directional_{k}"][:] = directional[k]
+        bands = _band_bounds(initial_mask.shape[0], band_rows)
+        has_fire = np.array([layers["state"][r0:r1].any() for _, r0, r1 in bands])
+
+        results = {}
+        hour = 0
+        with Pool(n_workers, initializer=_attach, initargs=(layers.spec, layers.shape)) as pool:
+            for step, (wind_u, wind_v) in enumerate(wind_frames):
+                hour = step + 1
+                layers["wind_u"][:] = wind_u
+                layers["wind_v"][:] = wind_v
+
+                # Only bands with fire in them or in an adjacent band can change
+                near_fire = has_fire.copy()
+                near_fire[1:] |= has_fire[:-1]
+                near_fire[:-1] |= has_fire[1:]
+                jobs = [(i, r0, r1, step, seed, ignition_prob)
+                        for i, r0, r1 in bands if near_fire[i]]
+                spread = pool.starmap(_spread_band, jobs)
+
+                touched = [jobs[k][:3] for k, hit in enumerate(spread) if hit]
+                pool.starmap(_commit_band, [(r0, r1) for _, r0, r1 in touched])
+                for i, _, _ in touched:
+                    has_fire[i] = True
+                if save_hours is not None and hour in save_hours:
+                    results[hour] = layers["state"].copy()
+        if save_hours is None and hour:
+            results[hour] = layers["state"].copy()
+        return results
+    finally:
+        layers.close()
+
+
+def benchmark_scaling(shape: tuple = (4096, 4096),
+                      n_steps: int = 6,
+                      worker_counts: list = None,
+                      band_rows: int = 256,
+                      seed: int = 42):
+    """Time the same synthetic run with 1, 2, 4, ... workers and check the outputs agree."""
+    max_workers = os.cpu_count() or 1
+    if worker_counts is None:
+        worker_counts = [2 ** k for k in range(max_workers.bit_length()) if 2 ** k <= max_workers]
+
+    rng = np.random.default_rng(seed)
+    mask = (rng.random(shape) < 1e-4).astype(np.uint8)
+    susceptibility = static_susceptibility(rng.random(shape, dtype=np.float32),
+                                           (rng.random(shape) < 0.9).astype(np.uint8))
+    wind_frames = [(rng.normal(0, 3, shape).astype(np.float32),
+                    rng.normal(0, 3, shape).astype(np.float32)) for _ in range(n_steps)]
+
+    reference, base_time = None, None
+    print(f"📏 Grid {shape[0]}x{shape[1]}, {n_steps} steps, {band_rows}-row bands")
+    for n_workers in worker_counts:
+        start = time.perf_counter()
+        final = simulate_parallel(mask, wind_frames, susceptibility, n_workers=n_workers,
+                                  band_rows=band_rows, seed=seed)[n_steps]
+        elapsed = time.perf_counter() - start
+        base_time = base_time or elapsed
+        if reference is None:
+            reference = final
+        same = "✅ identical" if np.array_equal(final, reference) else "❌ differs"
+        print(f"  {n_workers:>3} workers: {elapsed:7.2f}s  speedup {base_time / elapsed:5.2f}x  {same}")
+
+
+if __name__ == "__main__":
+    # === File paths ===
+    mask_path = 'data/processed/fire_labels/fire_20210419_downsampled_11x13.tif'
+    timesteps = [1, 2, 3, 6, 12]
+    weather_dir = 'data/processed/weather_tifs'
+    slope_path = 'data/processed/terrain/dem_slope_11x13.tif'
+    fuel_path = 'data/processed/fuel/fuel_binary_11x13.tif'
+    dem_path = None  # e.g. 'data/processed/terrain/dem_clipped.tif' for slope-aspect factors
+    output_mode = "per_hour"  # "per_hour" or "multiband" (written as COGs)
+    run_benchmark = False
+
+    if run_benchmark:
+        benchmark_scaling()
+    else:
+        with rasterio.open(mask_path) as src:
+            profile = src.profile
+            pred_mask = src.read(1).astype(np.uint8)
+        susceptibility, directional = load_static_factors(slope_path, fuel_path, dem_path=dem_path)
+
+        # One wind frame per simulated hour, interpolated from the ERA5 series
+        wind = WindField.from_tifs(weather_dir, profile)
+        wind_frames = (wind.frame(h) for h in range(1, max(timesteps) + 1))
+
+        results = simulate_parallel(pred_mask, wind_frames, susceptibility, directional,
+                                    save_hours=timesteps)
+
+        profile.update(dtype=rasterio.uint8, count=1)
+        writer = SpreadWriter(output_mode, profile, timesteps)
+        for hour in timesteps:
+            writer.add(hour, results[hour])
+        writer.close()
@@ -3,6 +3,16 @@ import rasterio
 from rasterio import Affine
 import matplotlib.pyplot as plt
 import os
+import heapq
+
+from spread_output import SpreadWriter
+from wind_field import WindField
+
+# 8-neighbour offsets, in the order every engine visits them
+NEIGHBORS = [(-1, -1), (-1, 0), (-1, 1),
+             (0, -1),           (0, 1),
+             (1, -1),  (1, 0),  (1, 1)]
+
 
 def spread_one_hour(current_mask: np.ndarray,
                     wind_u: np.ndarray,
@@ -14,19 +24,17 @@ def spread_one_hour(current_mask: np.ndarray,
     Simulate one hour of fire spread using a simple CA rule:
       - For each currently burning cell, attempt to ignite its 8 neighbors
       - Ignition probability increases with wind alignment, fuel presence, and slope
+
+    This is the reference implementation; `spread_one_hour_vectorized` gives
+    the same ignition statistics and is the one to use on real grids.
     """
     rows, cols = current_mask.shape
     next_ignitions = np.zeros_like(current_mask)
 
-    # Define 8-neighbor offsets
-    neighbors = [(-1, -1), (-1, 0), (-1, 1),
-                 (0, -1),           (0, 1),
-                 (1, -1),  (1, 0),  (1, 1)]
-
     for i in range(rows):
         for j in range(cols):
             if current_mask[i, j] == 1:
-                for di, dj in neighbors:
+                for di, dj in NEIGHBORS:
                     ni, nj = i + di, j + dj
                     if 0 <= ni < rows and 0 <= nj < cols:
                         if current_mask[ni, nj] == 0 and fuel[ni, nj] == 1:
@@ -38,46 +46,370 @@ def spread_one_hour(current_mask: np.ndarray,
     return next_ignitions
 
 
+def tile_rng(seed: int, step: int, tile_id: int) -> np.random.Generator:
+    """
+    Counter-based random stream for one tile at one step.
+
+    Philox is keyed by `seed` and its counter starts at (step, tile_id), so a
+    tile draws the same numbers regardless of which process handles it or
+    in what order tiles are visited.
+    """
+    return np.random.Generator(np.random.Philox(key=seed, counter=[0, 0, tile_id, step]))
+
+
+def _offset_slices(di: int, dj: int):
+    """
+    Return (source, target) index tuples that pair every cell with its
+    (di, dj) neighbour, clipped to the grid. Leading batch axes are kept.
+    """
+    def axis(d):
+        if d > 0:
+            return slice(0, -d), slice(d, None)
+        if d < 0:
+            return slice(-d, None), slice(0, d)
+        return slice(None), slice(None)
+
+    (src_r, dst_r), (src_c, dst_c) = axis(di), axis(dj)
+    return (Ellipsis, src_r, src_c), (Ellipsis, dst_r, dst_c)
+
+
+def static_susceptibility(slope: np.ndarray, fuel: np.ndarray) -> np.ndarray:
+    """
+    Per-cell static ignition factor: (1 + slope) where there is fuel, 0 elsewhere.
+    Cells with zero susceptibility can never ignite.
+    """
+    return np.where(fuel == 1, 1 + slope, 0)
+
+
+def _neighbor_prob(wind_u, wind_v, wind_speed, susceptibility,
+                   di: int, dj: int, ignition_prob: float):
+    """
+    Ignition probability for a burning cell with wind (wind_u, wind_v) trying
+    to ignite its (di, dj) neighbour with static factor `susceptibility`.
+    Shared by every engine so they all evaluate the exact same expression.
+    """
+    wind_alignment = wind_u * di + wind_v * dj
+    wind_factor = np.maximum(0, wind_alignment) / wind_speed
+    return ignition_prob * (1 + wind_factor) * susceptibility
+
+
+def spread_one_hour_vectorized(current_mask: np.ndarray,
+                               wind_u: np.ndarray,
+                               wind_v: np.ndarray,
+                               slope: np.ndarray,
+                               fuel: np.ndarray,
+                               ignition_prob: float = 0.3,
+                               rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Whole-array version of `spread_one_hour`.
+
+    Each of the 8 neighbour directions is handled as one shifted array
+    operation, and one uniform draw is taken per (burning cell, candidate
+    neighbour) pair, in direction order and then raster order of the target.
+    `current_mask` may carry leading batch axes, e.g. (N, H, W).
+    """
+    return spread_one_hour_static(current_mask, wind_u, wind_v,
+                                  static_susceptibility(slope, fuel),
+                                  ignition_prob=ignition_prob, rng=rng)
+
+
+def spread_one_hour_static(current_mask: np.ndarray,
+                           wind_u: np.ndarray,
+                           wind_v: np.ndarray,
+                           susceptibility: np.ndarray,
+                           directional: np.ndarray = None,
+                           ignition_prob: float = 0.3,
+                           rng: np.random.Generator = None) -> np.ndarray:
+    """
+    `spread_one_hour_vectorized` on precomputed static layers.
+
+    `susceptibility` replaces the slope and fuel layers (see
+    static_factors.py); the optional (8, H, W) `directional` array holds one
+    slope-aspect factor per neighbour direction, in NEIGHBORS order, indexed
+    at the target cell. Only the wind term is computed per call.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    burning = current_mask == 1
+    unburnt_fuel = (current_mask == 0) & (susceptibility > 0)
+    wind_speed = np.hypot(wind_u, wind_v) + 1e-6
+    next_ignitions = np.zeros_like(current_mask)
+
+    for k, (di, dj) in enumerate(NEIGHBORS):
+        src, dst = _offset_slices(di, dj)
+        candidates = burning[src] & unburnt_fuel[dst]
+        n_candidates = np.count_nonzero(candidates)
+        if n_candidates == 0:
+            continue
+        prob = _neighbor_prob(wind_u[src], wind_v[src], wind_speed[src],
+                              susceptibility[dst], di, dj, ignition_prob)
+        if directional is not None:
+            prob = prob * directional[k][dst]
+        prob = np.broadcast_to(prob, candidates.shape)[candidates]
+        hits = rng.random(n_candidates) < prob
+
+        target = next_ignitions[dst]
+        target[candidates] |= hits.astype(next_ignitions.dtype)
+    return next_ignitions
+
+
+def arrival_time(initial_mask: np.ndarray,
+                 wind_u: np.ndarray,
+                 wind_v: np.ndarray,
+                 slope: np.ndarray,
+                 fuel: np.ndarray,
+                 ignition_prob: float = 0.3,
+                 max_hours: float = None) -> np.ndarray:
+    """
+    Deterministic fire arrival time (hours) for every cell, in one pass.
+
+    The CA rule is turned into travel times: spreading from a burning cell
+    to a neighbour takes 1 / p hours, the expected wait for an hourly
+    ignition chance p (capped at 1) computed exactly as in `spread_one_hour`.
+    A heap-based Dijkstra search from the initial fire then gives the
+    minimum arrival time of every cell in O(N log N); thresholding it gives
+    any isochrone (see `isochrones`). Cells that never burn, or are beyond
+    `max_hours` when given, are inf. The wind field is held fixed.
+    """
+    return arrival_time_static(initial_mask, wind_u, wind_v, static_susceptibility(slope, fuel),
+                               ignition_prob=ignition_prob, max_hours=max_hours)
+
+
+def arrival_time_static(initial_mask: np.ndarray,
+                        wind_u: np.ndarray,
+                        wind_v: np.ndarray,
+                        susceptibility: np.ndarray,
+                        directional: np.ndarray = None,
+                        ignition_prob: float = 0.3,
+                        max_hours: float = None) -> np.ndarray:
+    """
+    `arrival_time` on precomputed static layers (see `spread_one_hour_static`);
+    the directional factors scale each edge's ignition chance.
+    """
+    rows, cols = initial_mask.shape
+    wind_u = np.asarray(wind_u, dtype=np.float32)
+    wind_v = np.asarray(wind_v, dtype=np.float32)
+    susceptibility = np.asarray(susceptibility, dtype=np.float32)
+    wind_speed = np.hypot(wind_u, wind_v) + np.float32(1e-6)
+
+    # Travel time out of every cell in each direction; inf where blocked.
+    # float32 (32 bytes per cell): arrival times only need hour fractions
+    costs = np.full((rows, cols, len(NEIGHBORS)), np.inf, dtype=np.float32)
+    for k, (di, dj) in enumerate(NEIGHBORS):
+        src, dst = _offset_slices(di, dj)
+        prob = _neighbor_prob(wind_u[src], wind_v[src], wind_speed[src],
+                              susceptibility[dst], di, dj, ignition_prob)
+        if directional is not None:
+            prob = prob * directional[k][dst]
+        prob = np.minimum(prob, np.float32(1.0))
+        with np.errstate(divide="ignore"):
+            costs[src + (k,)] = np.where(prob > 0, 1 / prob, np.inf)
+    costs = costs.reshape(rows * cols, len(NEIGHBORS))
+    steps = [di * cols + dj for di, dj in NEIGHBORS]
+
+    arrival = np.full(rows * cols, np.inf)
+    start = np.flatnonzero(initial_mask.ravel() == 1)
+    arrival[start] = 0.0
+    heap = [(0.0, int(i)) for i in start]
+    heapq.heapify(heap)
+
+    while heap:
+        t, i = heapq.heappop(heap)
+        if t > arrival[i]:
+            continue
+        if max_hours is not None and t > max_hours:
+            break
+        for step, cost in zip(steps, costs[i].tolist()):
+            if cost == np.inf:
+                continue
+            j = i + step
+            t_new = t + cost
+            if t_new < arrival[j]:
+                arrival[j] = t_new
+                heapq.heappush(heap, (t_new, j))
+
+    if max_hours is not None:
+        arrival[arrival > max_hours] = np.inf
+    return arrival.reshape(rows, cols).astype(np.float32)
+
+
+def isochrones(arrival: np.ndarray, hours: list) -> dict:
+    """Cumulative burn masks {hour: uint8 mask} from an `arrival_time` raster."""
+    return {hour: (arrival <= hour).astype(np.uint8) for hour in hours}
+
+
+class ActiveFront:
+    """
+    Sparse spread engine that only evaluates the neighbours of the fire front.
+
+    The front is the set of flat indices of burning cells that still border
+    at least one unburnt fuel cell; it is updated incrementally every step,
+    so the per-step cost scales with the perimeter rather than the grid.
+    Random draws are taken in the same order as `spread_one_hour_vectorized`
+    (or `spread_one_hour_static`, for `from_static`), so for a given seed
+    both engines burn exactly the same cells.
+    """
+
+    def __init__(self,
+                 mask: np.ndarray,
+                 slope: np.ndarray,
+                 fuel: np.ndarray,
+                 ignition_prob: float = 0.3):
+        self._setup(mask, static_susceptibility(slope, fuel), None, ignition_prob)
+
+    @classmethod
+    def from_static(cls,
+                    mask: np.ndarray,
+                    susceptibility: np.ndarray,
+                    directional: np.ndarray = None,
+                    ignition_prob: float = 0.3):
+        """Build the engine from precomputed static layers (see static_factors.py)."""
+        front = cls.__new__(cls)
+        front._setup(mask, susceptibility, directional, ignition_prob)
+        return front
+
+    def _setup(self, mask, susceptibility, directional, ignition_prob):
+        self.rows, self.cols = mask.shape
+        self.burned = mask.astype(np.uint8).ravel()
+        self.susceptibility = np.asarray(susceptibility).ravel()
+        self.fuel = self.susceptibility > 0
+        self.directional = (None if directional is None
+                            else np.asarray(directional).reshape(len(NEIGHBORS), -1))
+        self.ignition_prob = ignition_prob
+        self.front = self._edge_cells(np.flatnonzero(self.burned == 1))
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Cumulative burn mask as a (rows, cols) view."""
+        return self.burned.reshape(self.rows, self.cols)
+
+    def _neighbors(self, idx: np.ndarray, di: int, dj: int):
+        """
+        Return (inside, target): which cells of idx have an in-grid (di, dj)
+        neighbour, and that neighbour's flat index.
+        """
+        r, c = np.divmod(idx, self.cols)
+        nr, nc = r + di, c + dj
+        inside = (nr >= 0) & (nr < self.rows) & (nc >= 0) & (nc < self.cols)
+        return inside, nr[inside] * self.cols + nc[inside]
+
+    def _can_ignite(self, idx: np.ndarray) -> np.ndarray:
+        return (self.burned[idx] == 0) & self.fuel[idx]
+
+    def _edge_cells(self, idx: np.ndarray) -> np.ndarray:
+        """Keep the cells of idx that still have an unburnt fuel neighbour."""
+        keep = np.zeros(idx.size, dtype=bool)
+        for di, dj in NEIGHBORS:
+            inside, dst = self._neighbors(idx, di, dj)
+            keep[inside] |= self._can_ignite(dst)
+        return idx[keep]
+
+    def step(self,
+             wind_u: np.ndarray,
+             wind_v: np.ndarray,
+             rng: np.random.Generator) -> np.ndarray:
+        """Spread for one hour; returns the flat indices of newly ignited cells."""
+        wind_u, wind_v = wind_u.ravel(), wind_v.ravel()
+        ignited = []
+        for k, (di, dj) in enumerate(NEIGHBORS):
+            inside, dst = self._neighbors(self.front, di, dj)
+            candidates = self._can_ignite(dst)
+            src, dst = self.front[inside][candidates], dst[candidates]
+            if dst.size == 0:
+                continue
+            u, v = wind_u[src], wind_v[src]
+            prob = _neighbor_prob(u, v, np.hypot(u, v) + 1e-6,
+                                  self.susceptibility[dst], di, dj, self.ignition_prob)
+            if self.directional is not None:
+                prob = prob * self.directional[k][dst]
+            ignited.append(dst[rng.random(dst.size) < prob])
+
+        new_cells = np.unique(np.concatenate(ignited)) if ignited else np.empty(0, dtype=np.int64)
+        self.burned[new_cells] = 1
+        self.front = self._edge_cells(np.union1d(self.front, new_cells))
+        return new_cells
+
+
 if __name__ == "__main__":
     # === File paths ===
     mask_path = 'data/processed/fire_labels/fire_20210419_downsampled_11x13.tif'
     timesteps = [1, 2, 3, 6, 12]
-    wind_u_paths = [f"data/processed/weather_tifs/u10_{h:02d}.tif" for h in timesteps]
-    wind_v_paths = [f"data/processed/weather_tifs/v10_{h:02d}.tif" for h in timesteps]
+    engine = "vectorized"  # "vectorized", "frontier", "arrival" (deterministic) or "loop" (reference)
+    seed = 42
+    step_hours = 1.0  # CA time step; sub-hour steps get time-interpolated wind
+    output_mode = "per_hour"  # "per_hour", "multiband" or "arrival" (all written as COGs)
+    weather_dir = 'data/processed/weather_tifs'
     slope_path = 'data/processed/terrain/dem_slope_11x13.tif'
     fuel_path = 'data/processed/fuel/fuel_binary_11x13.tif'
+    builtup_path = None  # e.g. 'data/processed/human/ghsl_builtup_fraction_11x13.tif'
+    dem_path = None      # e.g. 'data/processed/terrain/dem_clipped.tif' for slope-aspect factors
+
+    # Imported here: static_factors imports this module
+    from static_factors import load_static_factors
 
     # === Load input layers ===
     with rasterio.open(mask_path) as src:
         profile = src.profile
         pred_mask = src.read(1).astype(np.uint8)
-    with rasterio.open(slope_path) as src:
-        slope = src.read(1).astype(np.float32)
-    with rasterio.open(fuel_path) as src:
-        fuel = src.read(1).astype(np.uint8)
+    # Static slope/fuel/built-up factors, computed once and cached (see static_factors.py)
+    susceptibility, directional = load_static_factors(slope_path, fuel_path, builtup_path, dem_path)
+    if engine == "loop":
+        # The reference engine works on the raw slope and fuel layers
+        with rasterio.open(slope_path) as src:
+            slope = src.read(1).astype(np.float32)
+        with rasterio.open(fuel_path) as src:
+            fuel = src.read(1).astype(np.uint8)
+
+    wind = WindField.from_tifs(weather_dir, profile)
 
     # === Initialize spread ===
     cum_mask = pred_mask.copy()
     results = {}
+    rng = np.random.default_rng(seed)
+    np.random.seed(seed)
+    step_prob = 0.3 * step_hours
+    if engine == "frontier":
+        front = ActiveFront.from_static(cum_mask, susceptibility, directional,
+                                        ignition_prob=step_prob)
+    save_steps = {int(round(h / step_hours)): h for h in timesteps}
+    profile.update(dtype=rasterio.uint8, count=1)
+    # Arrival times in minutes for sub-hour steps, so they don't round together
+    arrival_scale = 60.0 if step_hours < 1 else 1.0
+    writer = SpreadWriter(output_mode, profile, timesteps, arrival_scale=arrival_scale)
+    writer.start(cum_mask)
 
-    for idx, (u_path, v_path) in enumerate(zip(wind_u_paths, wind_v_paths)):
-        hour = timesteps[idx]
+    if engine == "arrival":
+        # One shortest-path pass under the mean wind over the whole horizon
+        n_steps = max(save_steps)
+        frames = [wind.frame(step * step_hours) for step in range(1, n_steps + 1)]
+        arrival = arrival_time_static(cum_mask,
+                                      np.mean([u for u, _ in frames], axis=0),
+                                      np.mean([v for _, v in frames], axis=0),
+                                      susceptibility, directional, max_hours=max(timesteps))
 
-        with rasterio.open(u_path) as src_u, rasterio.open(v_path) as src_v:
-            wind_u = src_u.read(1)
-            wind_v = src_v.read(1)
+    for step in range(1, max(save_steps) + 1):
+        wind_u, wind_v = wind.frame(step * step_hours)
 
-        new_ignitions = spread_one_hour(cum_mask, wind_u, wind_v, slope, fuel)
-        cum_mask = np.clip(cum_mask + new_ignitions, 0, 1)
-        results[hour] = cum_mask.copy()
+        if engine == "arrival":
+            cum_mask = np.maximum(pred_mask, arrival <= step * step_hours).astype(np.uint8)
+        elif engine == "frontier":
+            front.step(wind_u, wind_v, rng)
+            cum_mask = front.mask.copy()
+        else:
+            if engine == "loop":
+                new_ignitions = spread_one_hour(cum_mask, wind_u, wind_v, slope, fuel, step_prob)
+            else:
+                new_ignitions = spread_one_hour_static(cum_mask, wind_u, wind_v, susceptibility,
+                                                       directional, step_prob, rng=rng)
+            cum_mask = np.clip(cum_mask + new_ignitions, 0, 1)
 
         # === Save raster ===
-        out_path = f'outputs/fire_spread_t_plus_{hour}h.tif'
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        profile.update(dtype=rasterio.uint8, count=1)
-        with rasterio.open(out_path, 'w', **profile) as dst:
-            dst.write(cum_mask.astype(np.uint8), 1)
-        print(f"✅ Saved t+{hour}h spread raster to {out_path}")
+        hour = save_steps.get(step, step * step_hours)
+        writer.add(hour, cum_mask)
+        if step in save_steps:
+            results[hour] = cum_mask.copy()
+    writer.close()
 
     # === Plot all timesteps in one figure ===
     fig, axs = plt.subplots(1, len(timesteps), figsize=(4 * len(timesteps), 4))
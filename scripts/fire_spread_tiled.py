@@ -0,0 +1,187 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+
+from fire_spread_simulation import spread_one_hour_vectorized, tile_rng
+from spread_output import convert_to_cog
+from wind_field import WindField
+
+# State values in the on-disk burn grid. Cells ignited during the current
+# step are marked IGNITING until every tile has been processed, so a tile
+# reading its halo always sees the neighbour's start-of-step state.
+UNBURNT, BURNING, IGNITING = 0, 1, 2
+
+
+def _tile_windows(height: int, width: int, tile_size: int):
+    """Yield (tile_row, tile_col, window) for every tile of the grid."""
+    for ti, row in enumerate(range(0, height, tile_size)):
+        for tj, col in enumerate(range(0, width, tile_size)):
+            yield ti, tj, Window(col, row,
+                                 min(tile_size, width - col),
+                                 min(tile_size, height - row))
+
+
+def _with_halo(window: Window, height: int, width: int):
+    """Grow a window by one cell on each side (clipped to the grid) and
+    return it with the slices that select the original window from it."""
+    row0 = max(window.row_off - 1, 0)
+    col0 = max(window.col_off - 1, 0)
+    row1 = min(window.row_off + window.height + 1, height)
+    col1 = min(window.col_off + window.width + 1, width)
+    halo = Window(col0, row0, col1 - col0, row1 - row0)
+    inner = (slice(window.row_off - row0, window.row_off - row0 + window.height),
+             slice(window.col_off - col0, window.col_off - col0 + window.width))
+    return halo, inner
+
+
+def _freeze_halo(current: np.ndarray, inner: tuple) -> np.ndarray:
+    """
+    Mark halo cells that are not burning as IGNITING so they can act as
+    neither source nor target. Only the tile's own cells then draw random
+    numbers, which keeps each tile's stream independent of its neighbours.
+    """
+    halo = np.ones(current.shape, dtype=bool)
+    halo[inner] = False
+    current[halo & (current != BURNING)] = IGNITING
+    return current
+
+
+def _active_tiles(has_fire: np.ndarray) -> np.ndarray:
+    """Tiles that hold fire or touch a tile that does."""
+    padded = np.pad(has_fire, 1)
+    active = np.zeros_like(has_fire)
+    n_rows, n_cols = has_fire.shape
+    for di in (0, 1, 2):
+        for dj in (0, 1, 2):
+            active |= padded[di:di + n_rows, dj:dj + n_cols]
+    return active
+
+
+def _aligned(src, profile: dict, resampling: Resampling) -> WarpedVRT:
+    """View `src` on the simulation grid so windows index the same cells."""
+    return WarpedVRT(src, crs=profile["crs"], transform=profile["transform"],
+                     width=profile["width"], height=profile["height"],
+                     resampling=resampling)
+
+
+def simulate_tiled(mask_path: str,
+                   slope_path: str,
+                   fuel_path: str,
+                   wind: WindField,
+                   timesteps: list,
+                   out_pattern: str,
+                   tile_size: int = 1024,
+                   seed: int = 42,
+                   ignition_prob: float = 0.3,
+                   work_dir: str = None):
+    """
+    Out-of-core CA spread over rasters that do not fit in memory.
+
+    The burn state lives in an on-disk uint8 memmap; every hour from 1 to
+    max(timesteps) each active tile reads its window plus a one-cell halo
+    from the state, slope and fuel rasters, spreads with
+    `spread_one_hour_vectorized` and writes its own cells back. Slope and
+    fuel on other grids are warped onto the mask grid on the fly, and the
+    wind for each window comes from `wind.frame_window(hour, ...)`, one
+    window at a time.
+
+    Tiles with no fire in or next to them are skipped, and each requested
+    hour in `timesteps` is written block by block as a sparse tiled
+    GeoTIFF, then converted to a compressed COG, so peak memory depends on
+    `tile_size`, not on the grid size.
+    """
+    work_dir = tempfile.mkdtemp(dir=work_dir)
+    try:
+        with rasterio.open(mask_path) as src_mask, \
+             rasterio.open(slope_path) as slope_file, \
+             rasterio.open(fuel_path) as fuel_file:
+            height, width = src_mask.height, src_mask.width
+            n_tile_rows = -(-height // tile_size)
+            n_tile_cols = -(-width // tile_size)
+            profile = src_mask.profile
+            src_slope = _aligned(slope_file, profile, Resampling.bilinear)
+            src_fuel = _aligned(fuel_file, profile, Resampling.nearest)
+            profile.update(dtype=rasterio.uint8, count=1, nodata=None, tiled=True,
+                           blockxsize=256, blockysize=256, sparse_ok=True, compress="deflate")
+
+            # === Copy the initial mask into the on-disk state ===
+            state = np.lib.format.open_memmap(os.path.join(work_dir, "state.npy"),
+                                              mode="w+", dtype=np.uint8, shape=(height, width))
+            has_fire = np.zeros((n_tile_rows, n_tile_cols), dtype=bool)
+            for ti, tj, win in _tile_windows(height, width, tile_size):
+                block = (src_mask.read(1, window=win) == 1).astype(np.uint8)
+                state[win.toslices()] = block
+                has_fire[ti, tj] = block.any()
+
+            save_hours = set(timesteps)
+            n_spread = 0
+            for hour in range(1, max(timesteps) + 1):
+                touched = []
+                active = _active_tiles(has_fire)
+                for ti, tj, win in _tile_windows(height, width, tile_size):
+                    if not active[ti, tj]:
+                        continue
+                    halo, inner = _with_halo(win, height, width)
+                    current = _freeze_halo(np.array(state[halo.toslices()]), inner)
+                    if not (current == BURNING).any():
+                        continue
+
+                    wind_u, wind_v = wind.frame_window(hour, halo)
+                    new_ignitions = spread_one_hour_vectorized(
+                        current, wind_u, wind_v,
+                        src_slope.read(1, window=halo).astype(np.float32),
+                        src_fuel.read(1, window=halo).astype(np.uint8),
+                        ignition_prob,
+                        rng=tile_rng(seed, hour, ti * n_tile_cols + tj))[inner]
+                    if new_ignitions.any():
+                        state[win.toslices()][new_ignitions == 1] = IGNITING
+                        touched.append((ti, tj, win))
+
+                # === Commit this step's ignitions ===
+                for ti, tj, win in touched:
+                    block = state[win.toslices()]
+                    block[block == IGNITING] = BURNING
+                    has_fire[ti, tj] = True
+                n_spread += len(touched)
+                if hour not in save_hours:
+                    continue
+
+                # === Write output block by block (empty tiles stay sparse) ===
+                out_path = out_pattern.format(hour=hour)
+                scratch = os.path.join(work_dir, "spread.tif")
+                with rasterio.open(scratch, "w", **profile) as dst:
+                    for ti, tj, win in _tile_windows(height, width, tile_size):
+                        if has_fire[ti, tj]:
+                            dst.write(np.asarray(state[win.toslices()]), 1, window=win)
+                convert_to_cog(scratch, out_path)
+                print(f"✅ Saved t+{hour}h spread raster to {out_path} "
+                      f"({n_spread} tile-steps spread, {int(has_fire.sum())} tiles burning)")
+                n_spread = 0
+            src_slope.close()
+            src_fuel.close()
+            del state
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # === File paths ===
+    mask_path = 'data/processed/fire_labels/fire_20210419_label.tif'
+    timesteps = [1, 2, 3, 6, 12]  # hours to save; the CA steps every hour up to the last
+    weather_dir = 'data/processed/weather_tifs'
+    slope_path = 'data/processed/terrain/dem_slope_11x13.tif'
+    fuel_path = 'data/processed/fuel/fuel_binary_11x13.tif'
+
+    # Hourly wind, time-interpolated and resampled per tile (see wind_field.py)
+    with rasterio.open(mask_path) as src:
+        wind = WindField.from_tifs(weather_dir, src.profile)
+
+    simulate_tiled(mask_path, slope_path, fuel_path, wind, timesteps,
+                   out_pattern='outputs/tiled/fire_spread_t_plus_{hour}h.tif',
+                   tile_size=1024, seed=42, work_dir='outputs')
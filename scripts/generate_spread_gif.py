@@ -1,40 +1,48 @@
-import os
-import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
+import time
 
-# === Define hours to animate ===
-timesteps = [1, 2, 3, 6, 12]
+import numpy as np
+import rasterio
 
-# === Load and plot spread data into PNGs ===
-png_paths = []
-for hour in timesteps:
-    fig, ax = plt.subplots(figsize=(5, 5))
-    arr = plt.imread(f"outputs/fire_spread_t_plus_{hour}h.tif")
-    ax.imshow(arr, cmap='hot', vmin=0, vmax=1)
-    ax.set_title(f"Fire Spread at t+{hour}h")
-    ax.axis('off')
+from spread_animation import arrival_frames, raster_frames, render_animation
 
-    png_path = f"outputs/frame_t_plus_{hour}h.png"
-    plt.savefig(png_path, bbox_inches='tight')
-    plt.close(fig)
-    png_paths.append(png_path)
+# === Settings ===
+source = "per_hour"   # "per_hour" | "multiband" | "probability" | "arrival" (from fire_spread_*.py)
+timesteps = [1, 2, 3, 6, 12]
+gif_path = "outputs/fire_spread_animation.gif"   # or .mp4 (needs ffmpeg on PATH)
+cmap = "hot"
+max_size = 800        # longest side in pixels; larger grids are block-reduced, smaller repeated
 
-# === Load PNGs as PIL images ===
-frames = [Image.open(path).convert("RGB") for path in png_paths]
+# Arrival mode: frames every `frame_minutes` from one arrival-time raster
+arrival_scale = 1.0   # as given to SpreadWriter (60 when arrival times are in minutes)
+frame_minutes = 10
+arrival_fps = 12
 
-# === Save as animated GIF ===
-gif_path = "outputs/fire_spread_animation.gif"
-frames[0].save(
-    gif_path,
-    save_all=True,
-    append_images=frames[1:],
-    duration=2500,  # 2.5 seconds per frame
-    loop=0  # play only once
-)
+# === Frames straight from the rasters (no figures, no temporary PNGs) ===
+if source == "per_hour":
+    frames = raster_frames([(f"outputs/fire_spread_t_plus_{hour}h.tif", 1) for hour in timesteps],
+                           labels=[f"Fire Spread at t+{hour}h" for hour in timesteps],
+                           max_size=max_size)
+    fps = 0.4  # 2.5 seconds per frame
+elif source == "multiband":
+    path = "outputs/fire_spread_timesteps.tif"
+    with rasterio.open(path) as src:
+        bands = list(range(1, src.count + 1))
+        labels = [f"Fire Spread at {d}" if d else f"band {b}" for b, d in zip(bands, src.descriptions)]
+    frames = raster_frames([(path, b) for b in bands], labels=labels, max_size=max_size)
+    fps = 0.4
+elif source == "probability":
+    frames = raster_frames([(f"outputs/burn_probability_t_plus_{hour}h.tif", 1) for hour in timesteps],
+                           labels=[f"Burn probability at t+{hour}h" for hour in timesteps],
+                           max_size=max_size)
+    fps = 0.4
+else:
+    times = np.arange(0, max(timesteps) + 1e-9, frame_minutes / 60)
+    frames = arrival_frames("outputs/fire_arrival_time.tif", times, arrival_scale=arrival_scale,
+                            label="Fire Spread at t+{hour:.2f}h", max_size=max_size)
+    fps = arrival_fps
 
+# === Save as animated GIF / MP4 ===
+start = time.perf_counter()
+n_frames = render_animation(frames, gif_path, cmap=cmap, fps=fps)
+print(f"⏱️ Rendered {n_frames} frames in {time.perf_counter() - start:.2f}s")
 print(f"🎞️ Fire spread animation saved to {gif_path}")
-
-# === Optional: remove temporary PNGs ===
-for path in png_paths:
-    os.remove(path)
@@ -0,0 +1,224 @@
+# scripts/mosaic.py
+
+import glob
+import math
+import multiprocessing
+import os
+import resource
+import time
+from xml.sax.saxutils import escape
+
+import numpy as np
+import rasterio
+from rasterio.merge import merge
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import Resampling, calculate_default_transform
+from rasterio.windows import Window, from_bounds
+
+try:
+    from osgeo import gdal
+except ImportError:  # optional: the VRT XML is then written here
+    gdal = None
+
+GDAL_TYPES = {"uint8": "Byte", "int8": "Int8", "uint16": "UInt16", "int16": "Int16",
+              "uint32": "UInt32", "int32": "Int32", "uint64": "UInt64", "int64": "Int64",
+              "float32": "Float32", "float64": "Float64",
+              "complex64": "CFloat32", "complex128": "CFloat64"}
+
+
+def _pixels(value: float):
+    """Pixel offset/size for a VRT rect; whole numbers stay integers so aligned tiles are copied, not resampled."""
+    return round(value) if abs(value - round(value)) < 1e-6 else value
+
+
+def build_vrt(paths: list, vrt_path: str) -> str:
+    """
+    Write a GDAL VRT mosaic over tiles that share a CRS.
+
+    The VRT is a small XML file pointing at the tiles, so opening it costs
+    nothing and reads only touch the tiles a window overlaps. The mosaic
+    takes the first tile's resolution; tiles on another grid are resampled
+    by GDAL on read. Nodata pixels of a tile do not overwrite other tiles.
+    Uses gdal.BuildVRT when the GDAL Python bindings are installed.
+    """
+    if not paths:
+        raise ValueError(f"No tiles to mosaic into {vrt_path}")
+    os.makedirs(os.path.dirname(vrt_path) or ".", exist_ok=True)
+    srcs = [rasterio.open(p) for p in paths]
+    try:
+        first = srcs[0]
+        for src in srcs[1:]:
+            if src.crs != first.crs:
+                raise ValueError(f"{src.name} is in {src.crs}, {first.name} in {first.crs}; "
+                                 f"warp the tiles to one CRS before mosaicking")
+        if gdal is not None:
+            gdal.UseExceptions()
+            options = gdal.BuildVRTOptions(xRes=first.res[0], yRes=first.res[1])
+            vrt = gdal.BuildVRT(vrt_path, [os.path.abspath(p) for p in paths], options=options)
+            vrt = None  # closing the dataset writes the file
+            return vrt_path
+
+        unsupported = sorted(set(first.dtypes) - set(GDAL_TYPES))
+        if unsupported:
+            raise ValueError(f"{first.name} has band type {', '.join(unsupported)}, which "
+                             f"build_vrt cannot describe; supported: {', '.join(GDAL_TYPES)}")
+        res_x, res_y = first.res
+        left = min(s.bounds.left for s in srcs)
+        top = max(s.bounds.top for s in srcs)
+        width = round((max(s.bounds.right for s in srcs) - left) / res_x)
+        height = round((top - min(s.bounds.bottom for s in srcs)) / res_y)
+
+        lines = [f'<VRTDataset rasterXSize="{width}" rasterYSize="{height}">',
+                 f"  <SRS>{escape(first.crs.to_wkt())}</SRS>",
+                 f"  <GeoTransform>{left!r}, {res_x!r}, 0.0, {top!r}, 0.0, {-res_y!r}</GeoTransform>"]
+        for band in range(1, first.count + 1):
+            dtype = GDAL_TYPES[first.dtypes[band - 1]]
+            lines.append(f'  <VRTRasterBand dataType="{dtype}" band="{band}">')
+            if first.nodata is not None:
+                lines.append(f"    <NoDataValue>{first.nodata!r}</NoDataValue>")
+            for src in srcs:
+                xoff = _pixels((src.bounds.left - left) / res_x)
+                yoff = _pixels((top - src.bounds.top) / res_y)
+                xsize = _pixels((src.bounds.right - src.bounds.left) / res_x)
+                ysize = _pixels((src.bounds.top - src.bounds.bottom) / res_y)
+                lines += ["    <ComplexSource>",
+                          f'      <SourceFilename relativeToVRT="0">{escape(os.path.abspath(src.name))}</SourceFilename>',
+                          f"      <SourceBand>{band}</SourceBand>",
+                          f'      <SrcRect xOff="0" yOff="0" xSize="{src.width}" ySize="{src.height}"/>',
+                          f'      <DstRect xOff="{xoff}" yOff="{yoff}" xSize="{xsize}" ySize="{ysize}"/>']
+                if src.nodata is not None:
+                    lines.append(f"      <NODATA>{src.nodata!r}</NODATA>")
+                lines.append("    </ComplexSource>")
+            lines.append("  </VRTRasterBand>")
+        lines.append("</VRTDataset>")
+    finally:
+        for src in srcs:
+            src.close()
+
+    with open(vrt_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return vrt_path
+
+
+def _copy_windows(dst_path: str, profile: dict, block_size: int, read):
+    """Write `read(window)` for every block of the output grid."""
+    profile = profile.copy()
+    profile.update(driver="GTiff", tiled=True, blockxsize=256, blockysize=256,
+                   bigtiff="IF_SAFER")
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    with rasterio.open(dst_path, "w", **profile) as dst:
+        for row in range(0, profile["height"], block_size):
+            for col in range(0, profile["width"], block_size):
+                window = Window(col, row, min(block_size, profile["width"] - col),
+                                min(block_size, profile["height"] - row))
+                dst.write(read(window), window=window)
+
+
+def clip_to_bbox(src_path: str, dst_path: str, bbox: list, block_size: int = 2048):
+    """
+    Crop a raster (or VRT mosaic) to bbox = [minx, miny, maxx, maxy] in its
+    own CRS, snapped to its pixel grid, copying one block at a time.
+    """
+    with rasterio.open(src_path) as src:
+        window = from_bounds(*bbox, transform=src.transform)
+        window = window.round_offsets().round_lengths().intersection(
+            Window(0, 0, src.width, src.height))
+        profile = src.profile.copy()
+        profile.update(height=window.height, width=window.width,
+                       transform=src.window_transform(window))
+
+        def read(block):
+            return src.read(window=Window(window.col_off + block.col_off,
+                                          window.row_off + block.row_off,
+                                          block.width, block.height))
+
+        _copy_windows(dst_path, profile, block_size, read)
+
+
+def warp_to_bbox(src_path: str,
+                 dst_path: str,
+                 bbox: list,
+                 dst_crs: str = "EPSG:4326",
+                 resolution: float = None,
+                 resampling: Resampling = Resampling.nearest,
+                 block_size: int = 2048):
+    """
+    Reproject a raster (or VRT mosaic) onto a north-up grid covering bbox in
+    `dst_crs`, warping one output block at a time through a WarpedVRT.
+    `resolution` defaults to GDAL's suggested resolution for the source.
+    """
+    with rasterio.open(src_path) as src:
+        if resolution is None:
+            default, _, _ = calculate_default_transform(src.crs, dst_crs, src.width,
+                                                        src.height, *src.bounds)
+            resolution = default.a
+        minx, miny, maxx, maxy = bbox
+        width = math.ceil((maxx - minx) / resolution)
+        height = math.ceil((maxy - miny) / resolution)
+        transform = from_origin(minx, maxy, resolution, resolution)
+        profile = src.profile.copy()
+        profile.update(crs=dst_crs, transform=transform, width=width, height=height)
+
+        with WarpedVRT(src, crs=dst_crs, transform=transform, width=width, height=height,
+                       resampling=resampling) as vrt:
+            _copy_windows(dst_path, profile, block_size, lambda w: vrt.read(window=w))
+
+
+# === Benchmark: merge + clip vs VRT + windowed clip ===
+def _merge_then_clip(paths: list, bbox: list, out_dir: str):
+    """What the preprocessing scripts did before: full in-memory mosaic on disk, then crop."""
+    srcs = [rasterio.open(p) for p in paths]
+    mosaic, transform = merge(srcs)
+    meta = srcs[0].meta.copy()
+    meta.update(height=mosaic.shape[1], width=mosaic.shape[2], transform=transform)
+    merged_path = os.path.join(out_dir, "merged.tif")
+    with rasterio.open(merged_path, "w", **meta) as dst:
+        dst.write(mosaic)
+    del mosaic
+    with rasterio.open(merged_path) as src:
+        window = from_bounds(*bbox, transform=src.transform).round_offsets().round_lengths()
+        data = src.read(window=window)
+        meta.update(height=data.shape[1], width=data.shape[2],
+                    transform=src.window_transform(window))
+    with rasterio.open(os.path.join(out_dir, "clipped_merge.tif"), "w", **meta) as dst:
+        dst.write(data)
+
+
+def _vrt_then_clip(paths: list, bbox: list, out_dir: str):
+    vrt_path = build_vrt(paths, os.path.join(out_dir, "mosaic.vrt"))
+    clip_to_bbox(vrt_path, os.path.join(out_dir, "clipped_vrt.tif"), bbox)
+
+
+def _measured(fn, *args):
+    """Run in a fresh process: wall time and peak RSS (MB) of `fn(*args)`."""
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark_mosaic(paths: list, bbox: list, out_dir: str = "outputs/mosaic_benchmark"):
+    """Peak RSS and wall time of merge + clip versus VRT + windowed clip."""
+    os.makedirs(out_dir, exist_ok=True)
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for name, fn in (("merge + clip", _merge_then_clip), ("VRT + windowed clip", _vrt_then_clip)):
+        with ctx.Pool(1) as pool:
+            results[name] = pool.apply(_measured, (fn, paths, bbox, out_dir))
+
+    with rasterio.open(os.path.join(out_dir, "clipped_merge.tif")) as a, \
+            rasterio.open(os.path.join(out_dir, "clipped_vrt.tif")) as b:
+        identical = a.transform == b.transform and np.array_equal(a.read(), b.read())
+
+    print(f"\n📊 {len(paths)} tiles clipped to {bbox}")
+    for name, (seconds, rss_mb) in results.items():
+        print(f"  {name:<22} {seconds:8.2f}s   peak RSS {rss_mb:9.1f} MB")
+    print("✅ Outputs are identical" if identical else "❌ Outputs differ")
+    return results
+
+
+if __name__ == "__main__":
+    # Benchmark on the SRTM tiles used by preprocess_terrain_fuel.py
+    bbox = [130.5, -13.5, 133.5, -11.0]
+    terrain_files = sorted(glob.glob("data/raw/terrain/*.tif"))
+    benchmark_mosaic(terrain_files, bbox)
@@ -0,0 +1,255 @@
+# scripts/pipeline.py
+
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+STATE_PATH = "data/processed/.pipeline_state.json"
+LOG_DIR = "logs/pipeline"
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class Stage:
+    """
+    One preprocessing step: a script with the files it reads and writes.
+
+    `inputs` and `outputs` are paths or glob patterns. The scripts keep
+    their settings (bbox, pixel_size, resampling) as constants, so the
+    script source, and that of every repo module it imports, is hashed
+    with the inputs and any edit re-runs it.
+    """
+    name: str
+    script: str
+    inputs: list
+    outputs: list
+    deps: list = field(default_factory=list)
+
+
+# === Stage graph (paths relative to the repo root) ===
+STAGES = [
+    Stage("terrain_fuel", "preprocess_terrain_fuel.py",
+          inputs=["data/raw/terrain/*.tif", "data/raw/fuel/*.hdf"],
+          outputs=["data/processed/terrain/dem_clipped.tif",
+                   "data/processed/fuel/fuel_clipped.tif"]),
+    Stage("ghsl", "prepare_ghsl_builtup.py",
+          inputs=["data/raw/human/ghsl/*.tif"],
+          outputs=["data/processed/human/ghsl_builtup_clipped.tif",
+                   "data/processed/human/ghsl_builtup_fraction_11x13.tif"]),
+    Stage("era5", "extract_era5_to_tif.py",
+          inputs=["data/raw/weather/*.nc"],
+          outputs=["data/processed/weather_tifs/*.tif"]),
+    Stage("fire_labels", "rasterize_fire_labels.py",
+          inputs=["data/raw/fire_history/*.csv"],
+          outputs=["data/processed/fire_labels/fire_20210419_label.tif"]),
+    Stage("downsample_labels", "downsample_fire_labels.py",
+          inputs=["data/processed/fire_labels/fire_20210419_label.tif"],
+          outputs=["data/processed/fire_labels/fire_20210419_downsampled_11x13.tif"],
+          deps=["fire_labels"]),
+    Stage("slope", "compute_slope_from_dem.py",
+          inputs=["data/processed/terrain/dem_clipped.tif"],
+          outputs=["data/processed/terrain/dem_slope_11x13.tif"],
+          deps=["terrain_fuel"]),
+    Stage("fuel_binary", "prepare_fuel_binary.py",
+          inputs=["data/processed/fuel/fuel_clipped.tif"],
+          outputs=["data/processed/fuel/fuel_binary_11x13.tif",
+                   "data/processed/fuel/fuel_fraction_11x13.tif"],
+          deps=["terrain_fuel"]),
+    Stage("stack", "resample_and_stack.py",
+          inputs=["data/processed/weather_tifs/*.tif",
+                  "data/processed/terrain/dem_clipped.tif",
+                  "data/processed/fuel/fuel_clipped.tif",
+                  "data/processed/human/ghsl_builtup_clipped.tif"],
+          outputs=["data/processed/feature_store/store.json"],
+          deps=["era5", "terrain_fuel", "ghsl"]),
+    Stage("weather_features", "weather_features.py",
+          inputs=["data/raw/weather/*.nc",
+                  "data/processed/feature_store/static/*.npy"],
+          outputs=["data/processed/feature_store_daily/store.json"],
+          deps=["stack"]),
+    Stage("train", "train_fullstack.py",
+          inputs=["data/processed/feature_store/*/*.npy",
+                  "data/processed/fire_labels/fire_20210419_downsampled_11x13.tif"],
+          outputs=["models/fullstack_rf.joblib"],
+          deps=["stack", "downsample_labels"]),
+    Stage("compile", "compiled_forest.py",
+          inputs=["models/fullstack_rf.joblib"],
+          outputs=["models/fullstack_rf_compiled/forest.json"],
+          deps=["train"]),
+]
+
+
+def _expand(patterns: list) -> list:
+    paths = []
+    for pattern in patterns:
+        paths += sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+    return paths
+
+
+class _DigestCache:
+    """SHA-1 of file contents, reused while a file's size and mtime are unchanged."""
+
+    def __init__(self, entries: dict):
+        self.entries = entries
+
+    def digest(self, path: str) -> str:
+        if not os.path.exists(path):
+            return "missing"
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        cached = self.entries.get(path)
+        if cached and cached["stamp"] == stamp:
+            return cached["sha1"]
+        sha1 = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 22), b""):
+                sha1.update(chunk)
+        self.entries[path] = {"stamp": stamp, "sha1": sha1.hexdigest()}
+        return sha1.hexdigest()
+
+
+def local_modules(script: str) -> list:
+    """The script and every module in SCRIPTS_DIR it imports, directly or not."""
+    seen, todo = set(), [script]
+    while todo:
+        name = todo.pop()
+        path = os.path.join(SCRIPTS_DIR, name)
+        if name in seen or not os.path.exists(path):
+            continue
+        seen.add(name)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                todo += [alias.name.split(".")[0] + ".py" for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                todo.append(node.module.split(".")[0] + ".py")
+    return sorted(seen)
+
+
+def stage_key(stage: Stage, digests: _DigestCache) -> str:
+    """Hash of the stage's script, the repo modules it imports and every input file."""
+    parts = {"script": {name: digests.digest(os.path.join(SCRIPTS_DIR, name))
+                        for name in local_modules(stage.script)},
+             "inputs": {path: digests.digest(path) for path in _expand(stage.inputs)}}
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _outputs_exist(stage: Stage) -> bool:
+    return all(glob.glob(pattern) if glob.has_magic(pattern) else os.path.exists(pattern)
+               for pattern in stage.outputs)
+
+
+def _run_script(stage: Stage) -> float:
+    os.makedirs(LOG_DIR, exist_ok=True)
+    start = time.perf_counter()
+    with open(os.path.join(LOG_DIR, f"{stage.name}.log"), "w") as log:
+        subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, stage.script)],
+                       stdout=log, stderr=subprocess.STDOUT, check=True)
+    return time.perf_counter() - start
+
+
+def _with_ancestors(stages: dict, targets: list) -> set:
+    selected, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo += stages[name].deps
+    return selected
+
+
+def run_pipeline(stages: list = STAGES,
+                 targets: list = None,
+                 force: bool = False,
+                 max_workers: int = 4,
+                 state_path: str = STATE_PATH) -> dict:
+    """
+    Run the stages that are stale, in dependency order.
+
+    A stage is up to date when its outputs exist and the hash of its script
+    and input contents matches the last successful run, in which case it is
+    skipped. Inputs include upstream outputs, so a re-run stage that writes
+    identical files does not invalidate what follows. Stages whose
+    dependencies are done run concurrently in a thread pool of
+    subprocesses; `targets` limits the run to those stages and their
+    ancestors. Returns {stage: (status, seconds)}.
+    """
+    by_name = {s.name: s for s in stages}
+    selected = _with_ancestors(by_name, targets) if targets else set(by_name)
+    state = {"stages": {}, "files": {}}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    digests = _DigestCache(state["files"])
+
+    def save_state():
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        with open(state_path + ".tmp", "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(state_path + ".tmp", state_path)
+
+    report = {}
+    pending = set(selected)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            n_pending = len(pending)
+            for name in sorted(pending):
+                stage = by_name[name]
+                deps = [d for d in stage.deps if d in selected]
+                if any(report.get(d, ("",))[0] in ("failed", "blocked") for d in deps):
+                    report[name] = ("blocked", 0.0)
+                    pending.discard(name)
+                elif all(d in report for d in deps):
+                    # Hashing happens here, in the main thread, once upstream outputs exist
+                    pending.discard(name)
+                    key = stage_key(stage, digests)
+                    if not force and state["stages"].get(name) == key and _outputs_exist(stage):
+                        report[name] = ("skipped", 0.0)
+                        print(f"⏭️  {name}: up to date")
+                    else:
+                        print(f"🚀 {name}: running {stage.script}")
+                        running[pool.submit(_run_script, stage)] = (name, key)
+            if not running:
+                if pending and len(pending) == n_pending:
+                    raise ValueError(f"Dependency cycle among stages: {sorted(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key = running.pop(future)
+                try:
+                    seconds = future.result()
+                except subprocess.CalledProcessError:
+                    report[name] = ("failed", 0.0)
+                    print(f"❌ {name} failed, see {os.path.join(LOG_DIR, name + '.log')}")
+                    continue
+                report[name] = ("ran", seconds)
+                state["stages"][name] = key
+                save_state()
+                print(f"✅ {name} finished in {seconds:.1f}s")
+
+    print("\n📊 Pipeline summary")
+    for stage in stages:
+        if stage.name in report:
+            status, seconds = report[stage.name]
+            print(f"  {stage.name:<18} {status:<8} {seconds:8.1f}s")
+    return report
+
+
+if __name__ == "__main__":
+    # Settings
+    targets = None   # e.g. ["stack"] to build only the feature store and what it needs
+    force = False    # re-run every selected stage regardless of hashes
+    max_workers = 4
+
+    report = run_pipeline(STAGES, targets=targets, force=force, max_workers=max_workers)
+    if any(status in ("failed", "blocked") for status, _ in report.values()):
+        sys.exit(1)
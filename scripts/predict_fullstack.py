@@ -0,0 +1,118 @@
+# scripts/predict_fullstack.py
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import rasterio
+
+from compiled_forest import load_model
+from feature_store import FeatureStore, missing_mask
+
+MASK_NODATA = 255
+
+
+def _predict_block(model, block: np.ndarray) -> np.ndarray:
+    """
+    Fire probability for one (h, w, F) block of float features or uint8
+    bin codes; NaN where any feature is missing.
+    """
+    h, w, n_features = block.shape
+    pixels = block.reshape(-1, n_features)
+    valid = ~missing_mask(pixels).any(axis=1)
+    prob = np.full(h * w, np.nan, dtype=np.float32)
+    if valid.any():
+        fire_col = list(model.classes_).index(1)
+        prob[valid] = model.predict_proba(pixels[valid])[:, fire_col]
+    return prob.reshape(h, w)
+
+
+def predict_raster(model,
+                   store: FeatureStore,
+                   date: str,
+                   prob_path: str,
+                   mask_path: str,
+                   threshold: float = 0.5,
+                   block_size: int = 512,
+                   n_workers: int = 4):
+    """
+    Apply a per-pixel classifier to every block of the feature store.
+
+    Blocks are read from the store's memmaps and scored in a thread pool;
+    at most 2 * n_workers blocks are in flight, so memory depends on
+    `block_size`, not on the size of the region. Writes a float32 fire
+    probability GeoTIFF and a uint8 mask (prob >= threshold) on the store
+    grid, both with nodata where features are missing. A quantized store
+    is scored on its uint8 codes, which needs a model trained on the same
+    codes. The store's feature order and encoding are checked against the
+    model's `feature_names_` and `feature_encoding_`.
+    """
+    names = store.feature_names(date)
+    if getattr(model, "n_features_in_", len(names)) != len(names):
+        raise ValueError(f"Model expects {model.n_features_in_} features, "
+                         f"store has {len(names)} for {date}")
+    store.check_model(model, names)
+    if n_workers > 1 and hasattr(model, "n_jobs"):
+        model.n_jobs = 1  # parallelism comes from the block pool
+
+    base = store.profile
+    base.update(count=1, tiled=True, blockxsize=256, blockysize=256,
+                compress="deflate", bigtiff="IF_SAFER")
+    prob_profile = dict(base, dtype=rasterio.float32, nodata=np.nan)
+    mask_profile = dict(base, dtype=rasterio.uint8, nodata=MASK_NODATA)
+    for path in (prob_path, mask_path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def score(window):
+        return window, _predict_block(model, store.read(names, window, date))
+
+    write_lock = threading.Lock()
+    with rasterio.open(prob_path, "w", **prob_profile) as prob_dst, \
+            rasterio.open(mask_path, "w", **mask_profile) as mask_dst, \
+            ThreadPoolExecutor(max_workers=n_workers) as pool:
+
+        def write(future):
+            window, prob = future.result()
+            mask = np.where(np.isnan(prob), MASK_NODATA, prob >= threshold).astype(np.uint8)
+            with write_lock:
+                prob_dst.write(prob, 1, window=window)
+                mask_dst.write(mask, 1, window=window)
+
+        pending = deque()
+        for window in store.windows(block_size):
+            pending.append(pool.submit(score, window))
+            if len(pending) >= 2 * n_workers:
+                write(pending.popleft())
+        while pending:
+            write(pending.popleft())
+
+
+if __name__ == "__main__":
+    # Paths
+    store_dir = "data/processed/feature_store"
+    date      = "2021-04-19"
+    model_in  = "models/fullstack_rf.joblib"
+    compiled  = "models/fullstack_rf_compiled"  # from compiled_forest.py, used when exported from model_in
+    prob_out  = f"outputs/fire_probability_{date}.tif"
+    mask_out  = f"outputs/fire_prediction_{date}.tif"
+
+    # Settings
+    threshold  = 0.5
+    block_size = 512
+    n_workers  = os.cpu_count() or 1
+
+    store = FeatureStore.open(store_dir)
+    clf = load_model(model_in, compiled)
+
+    start = time.perf_counter()
+    predict_raster(clf, store, date, prob_out, mask_out,
+                   threshold=threshold, block_size=block_size, n_workers=n_workers)
+    elapsed = time.perf_counter() - start
+    H, W = store.shape
+    print(f"⏱️ Scored {H * W} pixels in {elapsed:.2f}s "
+          f"({H * W / elapsed:,.0f} pixels/s, {n_workers} workers)")
+    print("✅ Saved fire probability raster to", prob_out)
+    print("✅ Saved fire/no-fire mask to", mask_out)
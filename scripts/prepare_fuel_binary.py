@@ -1,6 +1,8 @@
 import rasterio
 import numpy as np
 
+from block_reduce import block_reduce_raster
+
 def create_binary_fuel(lc: np.ndarray) -> np.ndarray:
     # Classes 1-10 are flammable: forest, shrub, grassland, cropland
     return np.where((lc >= 1) & (lc <= 10), 1, 0).astype(np.uint8)
@@ -20,3 +22,9 @@ if __name__ == "__main__":
         dst.write(binary_fuel, 1)
 
     print(f"Binary fuel saved to {out_path}")
+
+    # Flammable share of each weather-grid cell, from the full-resolution classes
+    fraction_path = "data/processed/fuel/fuel_fraction_11x13.tif"
+    block_reduce_raster(in_path, fraction_path, (11, 13), method="fraction",
+                        preprocess=create_binary_fuel)
+    print(f"Fuel fraction saved to {fraction_path}")
@@ -1,75 +1,59 @@
 import os
 import glob
-import rasterio
-from rasterio.merge import merge
-from rasterio.warp import calculate_default_transform, reproject, Resampling
-from rasterio.mask import mask
-from shapely.geometry import box
-import geopandas as gpd
+import numpy as np
+from rasterio.warp import Resampling
 
-# ✅ Paths
-input_dir = "data/raw/human/ghsl"
-output_dir = "data/processed/human"
-os.makedirs(output_dir, exist_ok=True)
+from block_reduce import block_reduce_raster
+from mosaic import build_vrt, warp_to_bbox
+
+# ✅ Product: GHS_BUILT_LDSMT_GLOBE_R2018A tiles (see download_ghsl_builtin.py), a
+#    classified multitemporal built-up layer, one uint8 class per 30 m pixel:
+#      0 no data, 1 water, 2 land never built up,
+#      3 built 2000-2014, 4 built 1990-2000, 5 built 1975-1990, 6 built before 1975
+#    For GHS_BUILT_S tiles instead (built-up surface in m² per cell), set
+#    product = "BUILT_S" and source_cell_m to the tile resolution.
+product = "LDSMT"
+source_cell_m = 100.0
+BUILT_CLASSES = (3, 4, 5, 6)
 
-merged_path = os.path.join(output_dir, "ghsl_merged_moll.tif")
-reprojected_path = os.path.join(output_dir, "ghsl_wgs84.tif")
-final_clipped_path = os.path.join(output_dir, "ghsl_builtup_clipped.tif")
 
-# ✅ Step 1: Merge
-src_files = glob.glob(os.path.join(input_dir, "*.tif"))
-src_list = [rasterio.open(f) for f in src_files]
-mosaic, out_trans = merge(src_list)
-meta = src_list[0].meta.copy()
-meta.update({
-    "height": mosaic.shape[1],
-    "width": mosaic.shape[2],
-    "transform": out_trans
-})
-with rasterio.open(merged_path, "w", **meta) as dst:
-    dst.write(mosaic)
-print(f"✅ Merged: {merged_path}")
+def builtup_from_ldsmt(classes: np.ndarray) -> np.ndarray:
+    """1.0 for built-up classes, 0.0 for water and unbuilt land, NaN for no data (class 0)."""
+    built = np.isin(classes, BUILT_CLASSES).astype(np.float32)
+    built[classes == 0] = np.nan
+    return built
 
-# ✅ Step 2: Reproject to EPSG:4326
-dst_crs = "EPSG:4326"
-transform, width, height = calculate_default_transform(
-    meta["crs"], dst_crs,
-    meta["width"], meta["height"], *src_list[0].bounds
-)
-reprojected_meta = meta.copy()
-reprojected_meta.update({
-    "crs": dst_crs,
-    "transform": transform,
-    "width": width,
-    "height": height
-})
 
-with rasterio.open(reprojected_path, "w", **reprojected_meta) as dst:
-    for i in range(1, mosaic.shape[0] + 1):
-        reproject(
-            source=mosaic[i - 1],
-            destination=rasterio.band(dst, i),
-            src_transform=out_trans,
-            src_crs=meta["crs"],
-            dst_transform=transform,
-            dst_crs=dst_crs,
-            resampling=Resampling.nearest
-        )
-print(f"✅ Reprojected: {reprojected_path}")
+def builtup_from_surface(surface_m2: np.ndarray) -> np.ndarray:
+    """GHS_BUILT_S m² of built-up surface per cell as a 0-1 share of the cell."""
+    return np.clip(surface_m2.astype(np.float32) / source_cell_m ** 2, 0, 1)
 
-# ✅ Step 3: Clip to NT-Australia region
-bbox = box(130.5, -13.5, 133.5, -11.0)
-gdf = gpd.GeoDataFrame({"geometry": [bbox]}, crs=dst_crs)
 
-with rasterio.open(reprojected_path) as src:
-    out_image, out_transform = mask(src, gdf.geometry, crop=True)
-    clipped_meta = src.meta.copy()
-    clipped_meta.update({
-        "height": out_image.shape[1],
-        "width": out_image.shape[2],
-        "transform": out_transform
-    })
+# ✅ Paths
+input_dir = "data/raw/human/ghsl"
+output_dir = "data/processed/human"
+os.makedirs(output_dir, exist_ok=True)
 
-with rasterio.open(final_clipped_path, "w", **clipped_meta) as dst:
-    dst.write(out_image)
+mosaic_path = os.path.join(output_dir, "ghsl_mosaic_moll.vrt")
+final_clipped_path = os.path.join(output_dir, "ghsl_builtup_clipped.tif")
+fraction_path = os.path.join(output_dir, "ghsl_builtup_fraction_11x13.tif")
+
+# ✅ Step 1: Virtual mosaic of the Mollweide tiles (no merged raster)
+src_files = sorted(glob.glob(os.path.join(input_dir, "*.tif")))
+build_vrt(src_files, mosaic_path)
+print(f"✅ Mosaic (VRT): {mosaic_path}")
+
+# ✅ Step 2: Warp straight to EPSG:4326 over the NT-Australia region,
+#    block by block, so only the tiles under the bbox are read
+bbox = [130.5, -13.5, 133.5, -11.0]
+warp_to_bbox(mosaic_path, final_clipped_path, bbox, dst_crs="EPSG:4326",
+             resampling=Resampling.nearest)
 print(f"✅ Final Clipped Built-up Saved: {final_clipped_path}")
+
+# ✅ Step 3: Built-up share of each weather-grid cell (0-1, unitless), as used by
+#    static_factors.py to damp susceptibility. Classes are mapped to built/not
+#    built first, so water and unbuilt land count as 0, not as built-up.
+preprocess = builtup_from_ldsmt if product == "LDSMT" else builtup_from_surface
+block_reduce_raster(final_clipped_path, fraction_path, (11, 13), method="mean",
+                    preprocess=preprocess)
+print(f"✅ Built-up Fraction (0-1) Saved: {fraction_path}")
@@ -1,17 +1,18 @@
 import os
+import re
 import glob
-import rasterio
-from rasterio.merge import merge
-from rasterio.mask import mask
-from rasterio.warp import calculate_default_transform, reproject, Resampling
-from shapely.geometry import box
-import geopandas as gpd
+import time
+from concurrent.futures import ProcessPoolExecutor
 from osgeo import gdal
 
+from mosaic import build_vrt, clip_to_bbox
+
 # Common parameters
 bbox = [130.5, -13.5, 133.5, -11.0]  # [minx, miny, maxx, maxy]
 pixel_size = 0.0003  # ~30m in degrees
+fuel_pixel_size = 0.0045  # ~500m in degrees, MCD12Q1 native resolution
 crs_wgs84 = 'EPSG:4326'
+LC_FILL = 255  # LC_Type1 fill value
 
 # Directories
 raw_terrain_dir  = 'data/raw/terrain'
@@ -19,107 +20,108 @@ raw_fuel_dir     = 'data/raw/fuel'
 proc_terrain_dir = 'data/processed/terrain'
 proc_fuel_dir    = 'data/processed/fuel'
 
-os.makedirs(proc_terrain_dir, exist_ok=True)
-os.makedirs(proc_fuel_dir, exist_ok=True)
-
-# -----------------------
-# 1) PREPROCESS TERRAIN
-# -----------------------
-terrain_files = glob.glob(os.path.join(raw_terrain_dir, '*.tif'))
-srcs = [rasterio.open(fp) for fp in terrain_files]
-mosaic, out_trans = merge(srcs)
-meta = srcs[0].meta.copy()
-meta.update({
-    'height': mosaic.shape[1],
-    'width': mosaic.shape[2],
-    'transform': out_trans,
-    'crs': srcs[0].crs
-})
-merged_dem = os.path.join(proc_terrain_dir, 'dem_merged.tif')
-with rasterio.open(merged_dem, 'w', **meta) as dst:
-    dst.write(mosaic)
-print(f'✅ Merged DEM: {merged_dem}')
-
-# Clip DEM to bounding box
-geom = [box(*bbox)]
-gdf = gpd.GeoDataFrame({'geometry': geom}, crs=crs_wgs84)
-with rasterio.open(merged_dem) as src:
-    clipped_dem, transform = mask(src, gdf.geometry, crop=True)
-clip_meta = src.meta.copy()
-clip_meta.update({
-    'height': clipped_dem.shape[1],
-    'width': clipped_dem.shape[2],
-    'transform': transform
-})
-clipped_dem_path = os.path.join(proc_terrain_dir, 'dem_clipped.tif')
-with rasterio.open(clipped_dem_path, 'w', **clip_meta) as dst:
-    dst.write(clipped_dem)
-print(f'✅ Clipped DEM: {clipped_dem_path}')
-
-# -----------------------
-# 2) PREPROCESS FUEL (MCD12Q1 HDF)
-# -----------------------
-hdf_files = glob.glob(os.path.join(raw_fuel_dir, '*.hdf'))
-fuel_tifs = []
-
-for hdf_path in hdf_files:
-    print(f"📂 Processing HDF: {hdf_path}")
-    hdf_dataset = gdal.Open(hdf_path)
-    subdatasets = hdf_dataset.GetSubDatasets()
 
-    # Search for LC_Type1 subdataset
-    lc_type1_subds = None
-    for name, desc in subdatasets:
-        if 'LC_Type1' in name:
-            lc_type1_subds = name
-            break
+def _init_gdal(cache_mb: int, warp_threads: int):
+    """Per-process GDAL settings: bounded block cache and warper threads."""
+    gdal.UseExceptions()
+    gdal.SetCacheMax(cache_mb * 1024 * 1024)
+    gdal.SetConfigOption('GDAL_NUM_THREADS', str(warp_threads))
+
 
+def extract_lc_type1(hdf_path: str, out_dir: str, warp_threads: int = 2) -> str:
+    """
+    Warp the LC_Type1 subdataset of one MCD12Q1 granule straight onto the
+    bbox grid (EPSG:4326, fuel_pixel_size), without a temporary GeoTIFF.
+    Every granule lands on the same aligned grid, so the outputs mosaic
+    without resampling. Returns the output path, or None if LC_Type1 is missing.
+    """
+    hdf_dataset = gdal.Open(hdf_path)
+    lc_type1_subds = next((name for name, _ in hdf_dataset.GetSubDatasets()
+                           if 'LC_Type1' in name), None)
+    hdf_dataset = None
     if lc_type1_subds is None:
-        print(f"❌ LC_Type1 not found in {hdf_path}")
-        continue
-
-    # Step 1: Extract LC_Type1 to temp file (original projection)
-    temp_path = os.path.join(
-        proc_fuel_dir,
-        os.path.basename(hdf_path).replace('.hdf', '_temp.tif')
-    )
-    gdal.Translate(temp_path, lc_type1_subds)
-
-    # Step 2: Reproject to EPSG:4326
-    out_path = os.path.join(
-        proc_fuel_dir,
-        os.path.basename(hdf_path).replace('.hdf', '_LC_Type1.tif')
-    )
-    gdal.Warp(out_path, temp_path, dstSRS='EPSG:4326')
-    os.remove(temp_path)  # Clean up temporary file
-
-    fuel_tifs.append(out_path)
-    print(f"✅ Extracted & Reprojected LC_Type1 to: {out_path}")
-
-# ✅ Step 3: Merge all reprojected fuel .tif files
-srcs_fuel = [rasterio.open(fp) for fp in fuel_tifs]
-m_fuel, t_fuel = merge(srcs_fuel)
-fuel_meta = srcs_fuel[0].meta.copy()
-fuel_meta.update({
-    'height': m_fuel.shape[1],
-    'width': m_fuel.shape[2],
-    'transform': t_fuel
-})
-merged_fuel = os.path.join(proc_fuel_dir, 'fuel_merged.tif')
-with rasterio.open(merged_fuel, 'w', **fuel_meta) as dst:
-    dst.write(m_fuel)
-print(f'✅ Merged Fuel: {merged_fuel}')
-
-# ✅ Step 4: Clip merged fuel to bounding box
-with rasterio.open(merged_fuel) as src:
-    clipped_fuel, transform_f = mask(src, gdf.geometry, crop=True)
-clip_fuel_meta = src.meta.copy()
-clip_fuel_meta.update({
-    'height': clipped_fuel.shape[1],
-    'width': clipped_fuel.shape[2],
-    'transform': transform_f
-})
-clipped_fuel_path = os.path.join(proc_fuel_dir, 'fuel_clipped.tif')
-with rasterio.open(clipped_fuel_path, 'w', **clip_fuel_meta) as dst:
-    dst.write(clipped_fuel)
-print(f'✅ Clipped Fuel: {clipped_fuel_path}')
+        return None
+
+    out_path = os.path.join(out_dir, os.path.basename(hdf_path).replace('.hdf', '_LC_Type1.tif'))
+    gdal.Warp(out_path, lc_type1_subds,
+              dstSRS=crs_wgs84, outputBounds=bbox,
+              xRes=fuel_pixel_size, yRes=fuel_pixel_size, targetAlignedPixels=True,
+              resampleAlg='near', srcNodata=LC_FILL, dstNodata=LC_FILL,
+              multithread=True, warpOptions=[f'NUM_THREADS={warp_threads}'],
+              creationOptions=['TILED=YES', 'COMPRESS=DEFLATE'])
+    return out_path
+
+
+def granule_year(hdf_path: str) -> str:
+    """Acquisition year from an MCD12Q1 file name (MCD12Q1.AYYYYDDD.hXXvYY...)."""
+    match = re.search(r'\.A(\d{4})\d{3}\.', os.path.basename(hdf_path))
+    return match.group(1) if match else 'unknown'
+
+
+def preprocess_terrain():
+    # Virtual mosaic of the SRTM tiles: no merged raster in memory or on disk
+    terrain_files = sorted(glob.glob(os.path.join(raw_terrain_dir, '*.tif')))
+    dem_vrt = build_vrt(terrain_files, os.path.join(proc_terrain_dir, 'dem_mosaic.vrt'))
+    print(f'✅ DEM mosaic (VRT): {dem_vrt}')
+
+    # Clip DEM to bounding box, window by window
+    clipped_dem_path = os.path.join(proc_terrain_dir, 'dem_clipped.tif')
+    clip_to_bbox(dem_vrt, clipped_dem_path, bbox)
+    print(f'✅ Clipped DEM: {clipped_dem_path}')
+
+
+def preprocess_fuel(n_workers: int = None, gdal_cache_mb: int = 256, warp_threads: int = 2):
+    """
+    Extract LC_Type1 from every granule in a process pool, then mosaic and
+    clip per year. The latest year is written to fuel_clipped.tif, earlier
+    years to fuel_clipped_<year>.tif; granules without a year in their name
+    go to fuel_clipped_unknown.tif and are never taken as the latest. Peak
+    memory per worker is bounded by `gdal_cache_mb` plus the warper's chunk.
+    """
+    hdf_files = sorted(glob.glob(os.path.join(raw_fuel_dir, '*.hdf')))
+    if not hdf_files:
+        raise FileNotFoundError(f"No MCD12Q1 .hdf granules in {raw_fuel_dir}")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_gdal,
+                             initargs=(gdal_cache_mb, warp_threads)) as pool:
+        results = list(pool.map(extract_lc_type1, hdf_files,
+                                [proc_fuel_dir] * len(hdf_files),
+                                [warp_threads] * len(hdf_files)))
+
+    fuel_tifs_by_year = {}
+    for hdf_path, out_path in zip(hdf_files, results):
+        if out_path is None:
+            print(f"❌ LC_Type1 not found in {hdf_path}")
+            continue
+        fuel_tifs_by_year.setdefault(granule_year(hdf_path), []).append(out_path)
+    n_done = sum(len(paths) for paths in fuel_tifs_by_year.values())
+    print(f"✅ Extracted & Reprojected LC_Type1 from {n_done} granules "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    # Virtual mosaic per year, clipped to bounding box
+    years = [year for year in fuel_tifs_by_year if year != 'unknown']
+    if not years:
+        raise ValueError(f"No LC_Type1 granule in {raw_fuel_dir} has an acquisition year in its "
+                         f"name (MCD12Q1.AYYYYDDD...), so there is no latest year for fuel_clipped.tif")
+    latest = max(years)
+    for year, fuel_tifs in sorted(fuel_tifs_by_year.items()):
+        fuel_vrt = build_vrt(fuel_tifs, os.path.join(proc_fuel_dir, f'fuel_mosaic_{year}.vrt'))
+        name = 'fuel_clipped.tif' if year == latest else f'fuel_clipped_{year}.tif'
+        clipped_fuel_path = os.path.join(proc_fuel_dir, name)
+        clip_to_bbox(fuel_vrt, clipped_fuel_path, bbox)
+        print(f'✅ Clipped Fuel ({year}): {clipped_fuel_path}')
+
+
+if __name__ == "__main__":
+    os.makedirs(proc_terrain_dir, exist_ok=True)
+    os.makedirs(proc_fuel_dir, exist_ok=True)
+
+    # -----------------------
+    # 1) PREPROCESS TERRAIN
+    # -----------------------
+    preprocess_terrain()
+
+    # -----------------------
+    # 2) PREPROCESS FUEL (MCD12Q1 HDF)
+    # -----------------------
+    preprocess_fuel(n_workers=os.cpu_count(), gdal_cache_mb=256, warp_threads=2)
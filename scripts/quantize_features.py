@@ -0,0 +1,176 @@
+# scripts/quantize_features.py
+
+import os
+import time
+
+import numpy as np
+import rasterio
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from compiled_forest import CompiledForest
+from feature_store import MISSING_CODE, FeatureStore, missing_mask
+
+EDGES_FILE = "bin_edges.npy"
+
+
+def fit_bin_edges(store: FeatureStore,
+                  names: list,
+                  dates: list,
+                  n_bins: int = 255,
+                  sample_size: int = 200_000,
+                  seed: int = 42) -> np.ndarray:
+    """
+    Learn per-feature bin edges from a random sample of pixels.
+
+    Edges are the (n_bins - 1) inner quantiles of each feature, deduplicated,
+    so a feature with few distinct values (e.g. land-cover classes) gets
+    one bin per value. Returns a (F, n_bins - 1) float32 table padded with
+    +inf; code k covers (edge[k-1], edge[k]].
+    """
+    if n_bins > MISSING_CODE:
+        raise ValueError(f"At most {MISSING_CODE} bins fit in uint8 next to the missing code")
+    H, W = store.shape
+    rng = np.random.default_rng(seed)
+    per_date = max(1, sample_size // len(dates))
+    pixels = [np.sort(rng.choice(H * W, size=min(per_date, H * W), replace=False)) for _ in dates]
+    quantiles = np.arange(1, n_bins) / n_bins
+
+    edges = np.full((len(names), n_bins - 1), np.inf, dtype=np.float32)
+    for f, name in enumerate(names):
+        values = np.concatenate([store.feature(name, date).reshape(-1)[idx]
+                                 for date, idx in zip(dates, pixels)])
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            continue
+        inner = np.unique(np.quantile(values, quantiles).astype(np.float32))
+        edges[f, :inner.size] = inner
+    return edges
+
+
+def quantize(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """uint8 bin codes of one feature's values; NaN becomes MISSING_CODE."""
+    codes = np.searchsorted(edges, values, side="left").astype(np.uint8)
+    codes[np.isnan(values)] = MISSING_CODE
+    return codes
+
+
+def quantize_store(store: FeatureStore,
+                   out_dir: str,
+                   edges: np.ndarray,
+                   names: list,
+                   dates: list,
+                   strip_rows: int = 1024) -> FeatureStore:
+    """
+    Write a quantized copy of the store: the same features, dates and grid,
+    but uint8 bin codes. Each feature is streamed in row strips from its
+    memmap into the new one, so memory stays at one strip. The edges table
+    is saved next to the index, under "bins".
+    """
+    qstore = FeatureStore.create(out_dir, store.profile)
+    np.save(os.path.join(out_dir, EDGES_FILE), edges)
+    qstore.meta["bins"] = {"file": EDGES_FILE, "n_bins": int(edges.shape[1] + 1), "names": names}
+
+    static = set(store.feature_names())  # undated layers, written once
+    jobs = [(name, None) for name in names if name in static]
+    jobs += [(name, date) for date in dates for name in names if name not in static]
+    for name, date in jobs:
+        src = store.feature(name, date)
+        dst = qstore.create_feature(name, np.uint8, date)
+        feature_edges = edges[names.index(name)]
+        for row in range(0, src.shape[0], strip_rows):
+            dst[row:row + strip_rows] = quantize(src[row:row + strip_rows], feature_edges)
+        dst.flush()
+    qstore._save_meta()
+    return qstore
+
+
+def store_nbytes(store: FeatureStore) -> int:
+    return sum(os.path.getsize(os.path.join(store.root, e["file"])) for e in store.meta["features"])
+
+
+def _labelled_pixels(store: FeatureStore, names: list, date: str, label_path: str):
+    """(X, y) of every labelled pixel with all features present, in the store's dtype."""
+    X_blocks, y_blocks = [], []
+    with rasterio.open(label_path) as src:
+        for window, block in store.iter_blocks(names, date):
+            labels = src.read(1, window=window)
+            mask = (labels >= 0) & ~missing_mask(block).any(axis=-1)
+            X_blocks.append(block[mask])
+            y_blocks.append(labels[mask].astype(int))
+    return np.concatenate(X_blocks), np.concatenate(y_blocks)
+
+
+def compare_to_float(store: FeatureStore,
+                     qstore: FeatureStore,
+                     date: str,
+                     label_path: str,
+                     n_estimators: int = 200,
+                     seed: int = 42):
+    """
+    Accuracy and cost of training on bin codes versus float32 features:
+    the same pixels, split and forest settings as train_fullstack.py.
+    """
+    names = store.feature_names(date)
+    X_float, y = _labelled_pixels(store, names, date, label_path)
+    X_codes, y_codes = _labelled_pixels(qstore, names, date, label_path)
+    if not np.array_equal(y, y_codes):
+        raise ValueError("Float and quantized stores select different pixels")
+    train, test = train_test_split(np.arange(len(y)), test_size=0.2, random_state=seed, stratify=y)
+
+    print(f"\n📊 {len(y)} labelled pixels, {len(names)} features, "
+          f"store {store_nbytes(store) / 1e6:.1f} MB float32 vs {store_nbytes(qstore) / 1e6:.1f} MB uint8")
+    results = {}
+    for label, X in (("float32", X_float), ("uint8", X_codes)):
+        clf = RandomForestClassifier(n_estimators=n_estimators, n_jobs=-1, random_state=seed)
+        start = time.perf_counter()
+        clf.fit(X[train], y[train])
+        fit_time = time.perf_counter() - start
+
+        forest = CompiledForest.from_sklearn(clf)
+        forest.predict_proba(X[test][:16])  # warm-up (JIT compile / cache load)
+        start = time.perf_counter()
+        prob = forest.predict_proba(X[test])[:, list(clf.classes_).index(1)]
+        pred_time = time.perf_counter() - start
+
+        results[label] = prob
+        auc = roc_auc_score(y[test], prob) if len(np.unique(y[test])) > 1 else float("nan")
+        print(f"  {label:<8} X {X.nbytes / 1e6:8.2f} MB   fit {fit_time:6.2f}s   "
+              f"predict {len(test) / pred_time:12,.0f} pixels/s   "
+              f"F1 {f1_score(y[test], prob >= 0.5, zero_division=0):.3f}   AUC {auc:.3f}")
+
+    agree = np.mean((results["float32"] >= 0.5) == (results["uint8"] >= 0.5))
+    print(f"  fire/no-fire agreement on the test pixels: {agree:.2%}")
+    return results
+
+
+if __name__ == "__main__":
+    # Paths
+    store_dir  = "data/processed/feature_store"
+    out_dir    = "data/processed/feature_store_u8"   # train/predict on codes by pointing store_dir here
+    date       = "2021-04-19"
+    label_path = "data/processed/fire_labels/fire_20210419_downsampled_11x13.tif"
+
+    # Settings
+    n_bins      = 255       # codes 0..254, 255 = missing
+    sample_size = 200_000   # pixels sampled (over all dates) to learn the edges
+
+    store = FeatureStore.open(store_dir)
+    dates = store.dates()
+    names = store.feature_names(dates[0])
+
+    # 1) Learn bin edges from a sample
+    edges = fit_bin_edges(store, names, dates, n_bins=n_bins, sample_size=sample_size)
+    n_used = np.isfinite(edges).sum(axis=1)
+    print(f"✅ Learnt bin edges for {len(names)} features "
+          f"({n_used.min() + 1}-{n_used.max() + 1} bins per feature)")
+
+    # 2) Write the uint8 feature cube
+    start = time.perf_counter()
+    qstore = quantize_store(store, out_dir, edges, names, dates)
+    print(f"✅ Saved quantized feature store to {out_dir} in {time.perf_counter() - start:.1f}s")
+
+    # 3) Accuracy report against the float baseline
+    if os.path.exists(label_path):
+        compare_to_float(store, qstore, date, label_path)
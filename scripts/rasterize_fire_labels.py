@@ -1,58 +1,104 @@
 # scripts/rasterize_fire_labels.py
 
+import glob
 import os
+import numpy as np
 import pandas as pd
 import rasterio
 from rasterio.transform import from_origin
-from rasterio.features import rasterize
-from shapely.geometry import Point
-import numpy as np
 
-# ✅ Load fire CSV from raw folder
-fire_csv_path = os.path.join("data", "raw", "fire_history", "fire_20210419_24h_modis.csv")
-fire_df = pd.read_csv(fire_csv_path)  # ✅ Use the header row
-
-
-# ✅ Extract lat/lon points
-points = [Point(lon, lat) for lat, lon in zip(fire_df["latitude"], fire_df["longitude"])]
-
-# ✅ Define raster grid parameters (same as weather TIF region)
-pixel_size = 0.0003  # ~30m resolution at equator
-min_lon, max_lon = 130.5, 133.5
-min_lat, max_lat = -13.5, -11
-
-width = int((max_lon - min_lon) / pixel_size)
-height = int((max_lat - min_lat) / pixel_size)
-transform = from_origin(min_lon, max_lat, pixel_size, pixel_size)
-
-# ✅ Rasterize fire points as binary mask
-fire_mask = rasterize(
-    [(p, 1) for p in points],
-    out_shape=(height, width),
-    transform=transform,
-    fill=0,
-    dtype=np.uint8
-)
-
-# ✅ Save to processed folder
-# Ensure subfolder exists
-os.makedirs("data/processed/fire", exist_ok=True)
-
-# Save raster here
-out_path = "data/processed/fire_labels/fire_20210419_label.tif"
-os.makedirs(os.path.dirname(out_path), exist_ok=True)
-
-with rasterio.open(
-    out_path,
-    "w",
-    driver="GTiff",
-    height=height,
-    width=width,
-    count=1,
-    dtype=fire_mask.dtype,
-    crs="EPSG:4326",
-    transform=transform
-) as dst:
-    dst.write(fire_mask, 1)
-
-print(f"✅ Fire label raster saved at: {out_path}")
+
+def grid_for_bbox(bbox: list, pixel_size: float):
+    """(transform, (height, width)) of a north-up grid over bbox = [minx, miny, maxx, maxy]."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    width = int((max_lon - min_lon) / pixel_size)
+    height = int((max_lat - min_lat) / pixel_size)
+    return from_origin(min_lon, max_lat, pixel_size, pixel_size), (height, width)
+
+
+def point_cells(lon: np.ndarray, lat: np.ndarray, transform, shape: tuple):
+    """Flat cell index of every point inside the grid, plus the mask of points kept."""
+    cols, rows = ~transform * (np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+    cols, rows = np.floor(cols).astype(np.int64), np.floor(rows).astype(np.int64)
+    inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+    return rows[inside] * shape[1] + cols[inside], inside
+
+
+def _sparse_sum(cells: np.ndarray, weights: np.ndarray = None):
+    """Unique cells and the (weighted) number of points in each."""
+    unique, inverse = np.unique(cells, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights, minlength=unique.size)
+
+
+def bin_fire_points(csv_paths: list,
+                    transform,
+                    shape: tuple,
+                    value: str = "binary",
+                    chunksize: int = 1_000_000):
+    """
+    Bin FIRMS detections onto a grid, one raster per acquisition date.
+
+    CSVs are read in chunks; each chunk's lat/lon columns are mapped to
+    cells with the inverse affine transform and summed per (date, cell)
+    with np.bincount. Detections are kept grouped by date as occupied-cell
+    index arrays, and the grids are built and yielded one date at a time,
+    so memory follows the number of detections plus a single grid.
+    `value` is "binary" (uint8 fire/no fire), "count" (detections per
+    cell) or "frp" (summed fire radiative power). Yields (date, (H, W)
+    array) in date order.
+    """
+    columns = ["latitude", "longitude", "acq_date"] + (["frp"] if value == "frp" else [])
+    dtype = {"binary": np.uint8, "count": np.uint32, "frp": np.float32}[value]
+    sparse = {}
+    for csv_path in csv_paths:
+        for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+            cells, inside = point_cells(chunk["longitude"].to_numpy(),
+                                        chunk["latitude"].to_numpy(), transform, shape)
+            dates = chunk["acq_date"].to_numpy()[inside]
+            weights = chunk["frp"].to_numpy(dtype=np.float64)[inside] if value == "frp" else None
+            for date in np.unique(dates):
+                on_date = dates == date
+                sparse.setdefault(str(date), []).append(
+                    _sparse_sum(cells[on_date], None if weights is None else weights[on_date]))
+
+    for date in sorted(sparse):
+        parts = sparse.pop(date)
+        cells, sums = _sparse_sum(np.concatenate([c for c, _ in parts]),
+                                  np.concatenate([s for _, s in parts]))
+        grid = np.zeros(shape, dtype=dtype)
+        grid.flat[cells] = 1 if value == "binary" else sums
+        yield date, grid
+
+
+if __name__ == "__main__":
+    # ✅ FIRMS CSVs from the raw folder (one or many days per file)
+    fire_csv_paths = sorted(glob.glob(os.path.join("data", "raw", "fire_history", "*.csv")))
+
+    # ✅ Define raster grid parameters (same as weather TIF region)
+    bbox = [130.5, -13.5, 133.5, -11.0]  # [min_lon, min_lat, max_lon, max_lat]
+    pixel_size = 0.0003  # ~30m resolution at equator
+    value = "binary"     # "binary" | "count" | "frp"
+    transform, (height, width) = grid_for_bbox(bbox, pixel_size)
+
+    # ✅ Bin fire points per day and save each raster as soon as it is built
+    out_dir = "data/processed/fire_labels"
+    os.makedirs(out_dir, exist_ok=True)
+    for date, grid in bin_fire_points(fire_csv_paths, transform, (height, width), value=value):
+        suffix = "label" if value == "binary" else value
+        out_path = os.path.join(out_dir, f"fire_{date.replace('-', '')}_{suffix}.tif")
+        with rasterio.open(
+            out_path,
+            "w",
+            driver="GTiff",
+            height=height,
+            width=width,
+            count=1,
+            dtype=grid.dtype,
+            crs="EPSG:4326",
+            transform=transform,
+            tiled=True,
+            compress="deflate",
+        ) as dst:
+            dst.write(grid, 1)
+        print(f"✅ Fire {value} raster for {date} saved at: {out_path} "
+              f"({np.count_nonzero(grid)} fire cells)")
@@ -2,56 +2,86 @@
 
 import os
 import glob
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import rasterio
-from rasterio.warp import reproject, Resampling
-
-# Paths
-weather_dir = "data/processed/weather_tifs"
-dem_path    = "data/processed/terrain/dem_clipped.tif"
-fuel_path   = "data/processed/fuel/fuel_clipped.tif"
-human_path  = "data/processed/human/ghsl_builtup_clipped.tif"
-stack_out   = "data/processed/feature_stack.npz"
-
-# 1) Load weather grid reference
-weather_files = sorted(glob.glob(os.path.join(weather_dir, "*.tif")))
-with rasterio.open(weather_files[0]) as ref:
-    H, W      = ref.height, ref.width
-    transform = ref.transform
-    crs       = ref.crs
-    profile   = ref.profile
-
-# Read all weather bands into (H, W, T)
-weather_stack = np.zeros((H, W, len(weather_files)), dtype=np.float32)
-for i, fp in enumerate(weather_files):
-    with rasterio.open(fp) as src:
-        weather_stack[:, :, i] = src.read(1)
-
-# 2) Resample single-band raster to weather grid
-def load_and_resample(path):
-    with rasterio.open(path) as src:
-        data = src.read(1)
-        dst = np.zeros((H, W), dtype=data.dtype)
-        reproject(
-            source=data,
-            destination=dst,
-            src_transform=src.transform,
-            src_crs=src.crs,
-            dst_transform=transform,
-            dst_crs=crs,
-            resampling=Resampling.bilinear
-        )
-    return dst
-
-# 3) Resample terrain, fuel, human
-dem   = load_and_resample(dem_path)
-fuel  = load_and_resample(fuel_path)
-human = load_and_resample(human_path)
-
-# 4) Stack into (H, W, F)
-feature_stack = np.dstack([weather_stack, dem[:, :, None], fuel[:, :, None], human[:, :, None]])
-print(f"Feature stack shape: {feature_stack.shape}")  # Expect (11, 13, F)
-
-# 5) Save stack
-np.savez_compressed(stack_out, features=feature_stack)
-print("✅ Saved feature stack to", stack_out)
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+
+from feature_store import FeatureStore
+
+
+def output_windows(height: int, width: int, block_size: int):
+    """Yield the blocks of the output grid, row by row."""
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            yield Window(col, row, min(block_size, width - col), min(block_size, height - row))
+
+
+def align_layers(layers: list,
+                 store: FeatureStore,
+                 block_size: int = 256,
+                 n_threads: int = 4):
+    """
+    Warp every input layer onto the store's grid and write it as a feature.
+
+    `layers` is a list of (name, path, resampling, date), with date None for
+    static layers. Each input is wrapped in a WarpedVRT on the store grid
+    and read one output block at a time, so only the source pixels a block
+    needs are ever loaded. Layers are processed concurrently in a thread
+    pool, each filling its own memory-mapped feature file.
+    """
+    profile = store.profile
+    H, W = store.shape
+    targets = [store.create_feature(name, np.float32, date) for name, _, _, date in layers]
+
+    def warp_layer(target, path, resampling):
+        with rasterio.open(path) as src, WarpedVRT(src,
+                                                   crs=profile["crs"],
+                                                   transform=profile["transform"],
+                                                   width=W, height=H,
+                                                   resampling=resampling) as vrt:
+            for window in output_windows(H, W, block_size):
+                data = vrt.read(1, window=window, masked=True)
+                target[window.toslices()] = data.astype(np.float32).filled(np.nan)
+        target.flush()
+
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        futures = [pool.submit(warp_layer, target, path, resampling)
+                   for target, (_, path, resampling, _) in zip(targets, layers)]
+        for future in futures:
+            future.result()
+
+
+if __name__ == "__main__":
+    # Paths
+    weather_dir = "data/processed/weather_tifs"
+    dem_path    = "data/processed/terrain/dem_clipped.tif"
+    fuel_path   = "data/processed/fuel/fuel_clipped.tif"
+    human_path  = "data/processed/human/ghsl_builtup_clipped.tif"
+    store_dir   = "data/processed/feature_store"
+    date        = "2021-04-19"
+
+    # 1) Load weather grid reference
+    weather_files = sorted(glob.glob(os.path.join(weather_dir, "*.tif")))
+    with rasterio.open(weather_files[0]) as ref:
+        profile = ref.profile
+
+    # 2) Per-layer resampling: weather is already on the grid, DEM and
+    #    built-up are averaged, LC_Type1 is categorical so it takes the mode
+    layers = [(os.path.splitext(os.path.basename(fp))[0], fp, Resampling.nearest, date)
+              for fp in weather_files]
+    layers += [
+        ("dem", dem_path, Resampling.average, None),
+        ("fuel", fuel_path, Resampling.mode, None),
+        ("human", human_path, Resampling.average, None),
+    ]
+
+    # 3) Align block by block into the feature store
+    store = FeatureStore.open_or_create(store_dir, profile)
+    align_layers(layers, store)
+    print(f"Feature store: {len(store.feature_names(date))} features for {date} "
+          f"on a {profile['height']}x{profile['width']} grid")
+    print("✅ Saved features to", store_dir)
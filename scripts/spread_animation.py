@@ -0,0 +1,173 @@
+# scripts/spread_animation.py
+
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import rasterio
+from matplotlib import colormaps
+from PIL import Image, ImageDraw
+
+from block_reduce import block_reduce_band
+from spread_output import NEVER_BURNED
+
+# Palette layout: colormap levels, then the label colour and the nodata colour
+N_LEVELS = 254
+TEXT_INDEX = 254
+NODATA_INDEX = 255
+
+
+def colormap_lut(cmap: str = "hot",
+                 text_rgb: tuple = (255, 255, 255),
+                 nodata_rgb: tuple = (64, 64, 64)) -> np.ndarray:
+    """(256, 3) uint8 palette: N_LEVELS colormap entries, then label and nodata colours."""
+    lut = np.empty((256, 3), dtype=np.uint8)
+    lut[:N_LEVELS] = np.round(colormaps[cmap](np.linspace(0, 1, N_LEVELS))[:, :3] * 255)
+    lut[TEXT_INDEX] = text_rgb
+    lut[NODATA_INDEX] = nodata_rgb
+    return lut
+
+
+def to_codes(values: np.ndarray, vmin: float, vmax: float, missing: np.ndarray = None) -> np.ndarray:
+    """Palette indices of `values` scaled linearly from [vmin, vmax]; NaN and `missing` get NODATA_INDEX."""
+    scaled = (np.asarray(values, dtype=np.float32) - vmin) / (vmax - vmin)
+    missing = np.isnan(scaled) if missing is None else missing | np.isnan(scaled)
+    codes = (np.clip(np.nan_to_num(scaled), 0, 1) * (N_LEVELS - 1) + 0.5).astype(np.uint8)
+    codes[missing] = NODATA_INDEX
+    return codes
+
+
+def display_shape(shape: tuple, max_size: int = 800):
+    """
+    (reduced shape, upscale factor) so the longer side ends up near
+    `max_size`: large grids are block-reduced, small ones repeated.
+    """
+    H, W = shape
+    factor = int(np.ceil(max(H, W) / max_size))
+    if factor > 1:
+        return (int(np.ceil(H / factor)), int(np.ceil(W / factor))), 1
+    return (H, W), max(1, max_size // max(H, W))
+
+
+def _read_display(src, band: int, target_shape: tuple, method: str):
+    """One band at display resolution, plus its nodata mask."""
+    if target_shape == (src.height, src.width):
+        data = src.read(band)
+    else:
+        data = block_reduce_band(src, target_shape, method, band)
+    missing = np.zeros(data.shape, dtype=bool) if src.nodata is None else data == src.nodata
+    return data, missing
+
+
+def raster_frames(sources: list, labels: list = None, vmin: float = 0.0, vmax: float = 1.0,
+                  max_size: int = 800):
+    """
+    Yield (palette indices, label) for each (path, band) in `sources`, e.g.
+    cumulative spread masks or burn probabilities. Large rasters are
+    block-averaged while they are read, so a partly burned block shows the
+    burned fraction.
+    """
+    for k, (path, band) in enumerate(sources):
+        with rasterio.open(path) as src:
+            target, upscale = display_shape((src.height, src.width), max_size)
+            data, missing = _read_display(src, band, target, "mean")
+        codes = to_codes(data, vmin, vmax, missing)
+        yield _upscale(codes, upscale), labels[k] if labels else None
+
+
+def arrival_frames(path: str, times: list, arrival_scale: float = 1.0, fade_hours: float = 3.0,
+                   label: str = "t+{hour:.2f}h", max_size: int = 800):
+    """
+    Yield one frame per time in `times` (hours) from an arrival-time raster
+    (see SpreadWriter "arrival"), so long runs can be animated at any
+    sub-hourly rate from a single file. Cells burned by then are coloured by
+    how recently they ignited: the active front at the top of the colormap,
+    fading over `fade_hours` to a dim burned colour; unburned cells get the
+    bottom colour. Large rasters are reduced to each block's earliest
+    arrival once, up front.
+    """
+    with rasterio.open(path) as src:
+        target, upscale = display_shape((src.height, src.width), max_size)
+        arrival, _ = _read_display(src, 1, target, "min")
+    never = arrival == NEVER_BURNED
+    hours = arrival.astype(np.float32) / arrival_scale
+    dim = N_LEVELS // 4
+    for hour in times:
+        age = hour - hours
+        burned = ~never & (age >= 0)
+        codes = np.zeros(hours.shape, dtype=np.uint8)
+        fresh = 1 - np.clip(age[burned] / fade_hours, 0, 1)
+        codes[burned] = (dim + fresh * (N_LEVELS - 1 - dim)).astype(np.uint8)
+        yield _upscale(codes, upscale), label.format(hour=hour)
+
+
+def _upscale(codes: np.ndarray, factor: int) -> np.ndarray:
+    if factor == 1:
+        return codes
+    return np.repeat(np.repeat(codes, factor, axis=0), factor, axis=1)
+
+
+def _image(codes: np.ndarray, label: str, lut: np.ndarray) -> Image.Image:
+    """A palette image of the frame with its label drawn in TEXT_INDEX."""
+    h, w = codes.shape
+    image = Image.frombytes("P", (w, h), np.ascontiguousarray(codes).tobytes())
+    image.putpalette(lut.tobytes())
+    if label:
+        ImageDraw.Draw(image).text((6, 4), label, fill=TEXT_INDEX)
+    return image
+
+
+def save_gif(frames, out_path: str, lut: np.ndarray, duration_ms: float = 100, loop: int = 0) -> int:
+    """
+    Write frames as an animated GIF. Frames are palette images built from
+    the LUT, so there is no colour quantisation; Pillow keeps the encoded
+    frames (1 byte per pixel) until the file is written.
+    """
+    count = [0]
+
+    def images():
+        for codes, label in frames:
+            count[0] += 1
+            yield _image(codes, label, lut)
+
+    stream = images()
+    first = next(stream)
+    first.save(out_path, save_all=True, append_images=stream, duration=duration_ms, loop=loop)
+    return count[0]
+
+
+def save_mp4(frames, out_path: str, lut: np.ndarray, fps: float = 10, crf: int = 23) -> int:
+    """Stream frames as raw RGB into an ffmpeg (libx264) pipe; nothing is buffered."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg not found on PATH; write a .gif instead")
+    proc, count = None, 0
+    try:
+        for codes, label in frames:
+            rgb = lut[np.asarray(_image(codes, label, lut))]
+            h, w = rgb.shape[:2]
+            rgb = np.pad(rgb, ((0, h % 2), (0, w % 2), (0, 0)))  # yuv420p needs even sizes
+            if proc is None:
+                proc = subprocess.Popen(
+                    [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                     "-s", f"{rgb.shape[1]}x{rgb.shape[0]}", "-r", str(fps), "-i", "-",
+                     "-c:v", "libx264", "-pix_fmt", "yuv420p", "-crf", str(crf), out_path],
+                    stdin=subprocess.PIPE)
+            proc.stdin.write(rgb.tobytes())
+            count += 1
+    finally:
+        if proc is not None:
+            proc.stdin.close()
+            if proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed writing {out_path}")
+    return count
+
+
+def render_animation(frames, out_path: str, cmap: str = "hot", fps: float = 10) -> int:
+    """Write frames to a .gif or .mp4 (by extension); returns the frame count."""
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    lut = colormap_lut(cmap)
+    if out_path.lower().endswith(".mp4"):
+        return save_mp4(frames, out_path, lut, fps)
+    return save_gif(frames, out_path, lut, duration_ms=1000 / fps)
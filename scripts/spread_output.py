@@ -0,0 +1,213 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from rasterio.shutil import copy as rio_copy
+
+# Value written to the arrival-time raster for cells that never burn
+NEVER_BURNED = np.iinfo(np.uint16).max
+
+
+def _tiled_profile(profile: dict, dtype, count: int, compress: str, blocksize: int) -> dict:
+    out = profile.copy()
+    out.update(driver="GTiff", dtype=dtype, count=count, tiled=True,
+               blockxsize=blocksize, blockysize=blocksize,
+               compress=compress, bigtiff="IF_SAFER")
+    return out
+
+
+def convert_to_cog(src_path: str,
+                   dst_path: str,
+                   compress: str = "deflate",
+                   blocksize: int = 256,
+                   overview_resampling: str = "nearest"):
+    """Copy a GeoTIFF into a compressed Cloud-Optimized GeoTIFF with internal overviews."""
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    rio_copy(src_path, dst_path, driver="COG", compress=compress.upper(),
+             blocksize=blocksize, overview_resampling=overview_resampling,
+             bigtiff="IF_SAFER")
+
+
+def write_cog(dst_path: str,
+              bands: np.ndarray,
+              profile: dict,
+              compress: str = "deflate",
+              blocksize: int = 256,
+              overview_resampling: str = "nearest",
+              descriptions: list = None,
+              tags: dict = None):
+    """
+    Write a (H, W) or (B, H, W) array as a COG, with optional band
+    descriptions and dataset tags.
+
+    The data is first written block by block to a tiled, compressed scratch
+    GeoTIFF, which GDAL's COG driver then copies with overviews, so no
+    uncompressed full-grid copy is ever made.
+    """
+    bands = bands[None] if bands.ndim == 2 else bands
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    scratch_dir = tempfile.mkdtemp(dir=os.path.dirname(dst_path) or ".")
+    try:
+        scratch = os.path.join(scratch_dir, "scratch.tif")
+        tmp_profile = _tiled_profile(profile, bands.dtype, bands.shape[0], compress, blocksize)
+        with rasterio.open(scratch, "w", **tmp_profile) as dst:
+            for b in range(bands.shape[0]):
+                for _, window in dst.block_windows(1):
+                    dst.write(bands[b][window.toslices()], b + 1, window=window)
+                if descriptions:
+                    dst.set_band_description(b + 1, descriptions[b])
+            if tags:
+                dst.update_tags(**tags)
+        convert_to_cog(scratch, dst_path, compress, blocksize, overview_resampling)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+class SpreadWriter:
+    """
+    Output sink for a spread run; call `add(hour, cum_mask)` after every step.
+
+    Modes:
+      - "per_hour":   one COG per output hour (`pattern` formatted with hour)
+      - "multiband":  a single COG with one band per output hour
+      - "arrival":    a single uint16 COG holding the first hour each cell
+                      burned (0 for the initial fire, NEVER_BURNED otherwise);
+                      it records every step, not only the output hours
+    `arrival_scale` multiplies hours before rounding, e.g. 60 for minutes;
+    the resulting unit is written to the band description and ARRIVAL_UNIT tag.
+    """
+
+    def __init__(self,
+                 mode: str,
+                 profile: dict,
+                 timesteps: list,
+                 pattern: str = "outputs/fire_spread_t_plus_{hour}h.tif",
+                 path: str = None,
+                 compress: str = "deflate",
+                 arrival_scale: float = 1.0):
+        if mode not in ("per_hour", "multiband", "arrival"):
+            raise ValueError(f"Unknown output mode: {mode}")
+        self.mode = mode
+        self.profile = profile.copy()
+        self.timesteps = list(timesteps)
+        self.pattern = pattern
+        self.path = path or {"multiband": "outputs/fire_spread_timesteps.tif",
+                             "arrival": "outputs/fire_arrival_time.tif"}.get(mode)
+        self.compress = compress
+        self.arrival_scale = arrival_scale
+        self._bands = {}
+        self._arrival = None
+
+    @property
+    def arrival_unit(self) -> str:
+        return {1.0: "hours", 60.0: "minutes"}.get(float(self.arrival_scale),
+                                                   f"1/{self.arrival_scale:g} hours")
+
+    def start(self, initial_mask: np.ndarray):
+        if self.mode == "arrival":
+            self._arrival = np.full(initial_mask.shape, NEVER_BURNED, dtype=np.uint16)
+            self._arrival[initial_mask == 1] = 0
+
+    def add(self, hour: float, cum_mask: np.ndarray):
+        if self.mode == "arrival":
+            if self._arrival is None:
+                raise RuntimeError("call start(initial_mask) before add() in arrival mode")
+            newly = (cum_mask == 1) & (self._arrival == NEVER_BURNED)
+            self._arrival[newly] = min(int(round(hour * self.arrival_scale)), NEVER_BURNED - 1)
+        elif hour in self.timesteps:
+            if self.mode == "per_hour":
+                out_path = self.pattern.format(hour=hour)
+                write_cog(out_path, cum_mask.astype(np.uint8), self.profile, self.compress)
+                print(f"✅ Saved t+{hour}h spread raster to {out_path}")
+            else:
+                self._bands[hour] = cum_mask.astype(np.uint8)
+
+    def close(self):
+        if self.mode == "multiband":
+            hours = [h for h in self.timesteps if h in self._bands]
+            write_cog(self.path, np.stack([self._bands[h] for h in hours]), self.profile,
+                      self.compress, descriptions=[f"t+{h}h" for h in hours])
+            print(f"✅ Saved {len(hours)} timesteps as bands of {self.path}")
+        elif self.mode == "arrival":
+            profile = dict(self.profile, nodata=NEVER_BURNED)
+            write_cog(self.path, self._arrival, profile, self.compress,
+                      descriptions=[f"arrival time ({self.arrival_unit})"],
+                      tags={"ARRIVAL_UNIT": self.arrival_unit,
+                            "ARRIVAL_SCALE": f"{self.arrival_scale:g}"})
+            print(f"✅ Saved fire arrival-time raster to {self.path} (in {self.arrival_unit})")
+
+
+def _dir_size(paths: list) -> int:
+    return sum(os.path.getsize(p) for p in paths)
+
+
+def benchmark_outputs(masks: dict, profile: dict, out_dir: str = "outputs/output_benchmark"):
+    """
+    Compare write time and on-disk size of the output formats for the
+    cumulative masks in `masks` ({hour: (H, W) array}).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    hours = sorted(masks)
+    results = []
+
+    # Baseline: what the driver used to write (untiled, uncompressed)
+    start = time.perf_counter()
+    paths = []
+    plain = profile.copy()
+    plain.update(driver="GTiff", dtype=rasterio.uint8, count=1)
+    for key in ("tiled", "blockxsize", "blockysize", "compress"):
+        plain.pop(key, None)
+    for hour in hours:
+        path = os.path.join(out_dir, f"plain_t_plus_{hour}h.tif")
+        with rasterio.open(path, "w", **plain) as dst:
+            dst.write(masks[hour].astype(np.uint8), 1)
+        paths.append(path)
+    results.append(("plain GTiff per hour", time.perf_counter() - start, _dir_size(paths)))
+
+    for compress in ("deflate", "zstd"):
+        start = time.perf_counter()
+        paths = []
+        try:
+            for hour in hours:
+                path = os.path.join(out_dir, f"cog_{compress}_t_plus_{hour}h.tif")
+                write_cog(path, masks[hour].astype(np.uint8), profile, compress)
+                paths.append(path)
+        except rasterio.errors.RasterioError as err:
+            print(f"⚠️ Skipping {compress.upper()}: {err}")
+            continue
+        results.append((f"COG {compress} per hour", time.perf_counter() - start, _dir_size(paths)))
+
+    start = time.perf_counter()
+    path = os.path.join(out_dir, "cog_multiband.tif")
+    write_cog(path, np.stack([masks[h].astype(np.uint8) for h in hours]), profile,
+              descriptions=[f"t+{h}h" for h in hours])
+    results.append(("COG multiband", time.perf_counter() - start, _dir_size([path])))
+
+    start = time.perf_counter()
+    path = os.path.join(out_dir, "cog_arrival.tif")
+    writer = SpreadWriter("arrival", profile, hours, path=path)
+    writer.start(np.zeros_like(masks[hours[0]]))
+    for hour in hours:
+        writer.add(hour, masks[hour])
+    writer.close()
+    results.append(("COG arrival time", time.perf_counter() - start, _dir_size([path])))
+
+    print(f"\n📊 {len(hours)} timesteps on a {masks[hours[0]].shape[0]}x{masks[hours[0]].shape[1]} grid")
+    base_size = results[0][2]
+    for name, seconds, size in results:
+        print(f"  {name:<22} {seconds:8.3f}s  {size / 1e6:10.2f} MB  ({size / base_size:6.1%} of plain)")
+    return results
+
+
+if __name__ == "__main__":
+    # Benchmark on the spread outputs from fire_spread_simulation.py
+    timesteps = [1, 2, 3, 6, 12]
+    masks = {}
+    for hour in timesteps:
+        with rasterio.open(f"outputs/fire_spread_t_plus_{hour}h.tif") as src:
+            profile = src.profile
+            masks[hour] = src.read(1)
+    benchmark_outputs(masks, profile)
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+
+from fire_spread_simulation import NEIGHBORS, static_susceptibility
+
+# Bump when the factor formulas change so stale caches are not reused
+FACTORS_VERSION = 2
+
+
+def directional_slope_factors(dem: np.ndarray,
+                              cell_size_m: float,
+                              cell_width_m=None,
+                              uphill_gain: float = 1.0,
+                              max_boost: float = 1.0,
+                              max_damping: float = 0.5) -> np.ndarray:
+    """
+    Slope-aspect factor for spreading into each cell from each of its 8
+    neighbours, as an (8, H, W) float32 array in NEIGHBORS order.
+
+    For direction (di, dj) the value at a target cell is
+    1 + uphill_gain * rise / run, where rise is the elevation gain from the
+    source cell (target - (di, dj)) and run the centre distance. It is
+    clipped to [1 - max_damping, 1 + max_boost], so fire runs faster uphill
+    and slower downhill. Cells without a source in that direction get 1.
+    `cell_size_m` is the cell height; `cell_width_m` (default: the same) is
+    the cell width, either one value or one per row, as on a lat/lon grid.
+    """
+    dem = dem.astype(np.float32)
+    dy = float(cell_size_m)
+    dx = np.broadcast_to(np.asarray(cell_size_m if cell_width_m is None else cell_width_m,
+                                    dtype=np.float32), (dem.shape[0],))
+    factors = np.ones((len(NEIGHBORS),) + dem.shape, dtype=np.float32)
+    for k, (di, dj) in enumerate(NEIGHBORS):
+        rows = slice(max(di, 0), dem.shape[0] + min(di, 0))
+        cols = slice(max(dj, 0), dem.shape[1] + min(dj, 0))
+        src_rows = slice(max(-di, 0), dem.shape[0] + min(-di, 0))
+        src_cols = slice(max(-dj, 0), dem.shape[1] + min(-dj, 0))
+        rise = dem[rows, cols] - dem[src_rows, src_cols]
+        run = np.hypot(di * dy, dj * dx[rows])[:, None]
+        factors[k, rows, cols] = np.clip(1 + uphill_gain * rise / run,
+                                         1 - max_damping, 1 + max_boost)
+    return factors
+
+
+def compute_static_factors(slope: np.ndarray,
+                           fuel: np.ndarray,
+                           builtup: np.ndarray = None,
+                           dem: np.ndarray = None,
+                           cell_size_m: float = None,
+                           cell_width_m=None):
+    """
+    Combine the static layers into what the spread engines consume.
+
+    Returns (susceptibility, directional). Susceptibility is the
+    `static_susceptibility` of slope and fuel, reduced in proportion to the
+    built-up fraction (0-1) when `builtup` is given. Directional is the
+    (8, H, W) output of `directional_slope_factors`, or None without a DEM.
+    """
+    susceptibility = static_susceptibility(slope, fuel).astype(np.float32)
+    if builtup is not None:
+        susceptibility *= 1 - np.clip(np.nan_to_num(builtup), 0, 1).astype(np.float32)
+
+    directional = None
+    if dem is not None:
+        directional = directional_slope_factors(dem, cell_size_m, cell_width_m)
+    return susceptibility, directional
+
+
+def file_digest(path: str, chunk_size: int = 1 << 22) -> str:
+    """SHA-1 of a file's contents, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cell_size_metres(profile: dict):
+    """
+    (cell height, cell width per row) in metres for a raster profile. On a
+    geographic CRS a degree of longitude shrinks with cos(latitude), so the
+    width is worked out at each row's centre latitude.
+    """
+    transform = profile["transform"]
+    height, width = abs(transform.e), np.full(profile["height"], abs(transform.a))
+    if profile["crs"] and profile["crs"].is_geographic:
+        lat = transform.f + transform.e * (np.arange(profile["height"]) + 0.5)
+        height *= 111_320.0  # metres per degree of latitude
+        width *= 111_320.0 * np.cos(np.radians(lat))
+    return height, width
+
+
+def _read_on_grid(path: str, profile: dict, resampling: Resampling) -> np.ndarray:
+    with rasterio.open(path) as src, WarpedVRT(src, crs=profile["crs"],
+                                               transform=profile["transform"],
+                                               width=profile["width"],
+                                               height=profile["height"],
+                                               resampling=resampling) as vrt:
+        return vrt.read(1)
+
+
+def load_static_factors(slope_path: str,
+                        fuel_path: str,
+                        builtup_path: str = None,
+                        dem_path: str = None,
+                        cache_dir: str = "data/processed/static_cache"):
+    """
+    Cached `compute_static_factors` on the slope raster's grid.
+
+    Results are stored as .npy files named by a hash of the input file
+    contents and settings, and are memory-mapped on later calls, so repeat
+    runs and ensemble members skip all static-layer work.
+    """
+    inputs = {"slope": slope_path, "fuel": fuel_path,
+              "builtup": builtup_path, "dem": dem_path}
+    key_source = {name: file_digest(path) for name, path in inputs.items() if path}
+    key_source["version"] = FACTORS_VERSION
+    key = hashlib.sha1(json.dumps(key_source, sort_keys=True).encode()).hexdigest()[:16]
+
+    susceptibility_path = os.path.join(cache_dir, f"{key}_susceptibility.npy")
+    directional_path = os.path.join(cache_dir, f"{key}_directional.npy")
+    if os.path.exists(susceptibility_path):
+        directional = (np.load(directional_path, mmap_mode="r")
+                       if dem_path else None)
+        print(f"♻️ Using cached static factors {key}")
+        return np.load(susceptibility_path, mmap_mode="r"), directional
+
+    with rasterio.open(slope_path) as src:
+        profile = src.profile
+        slope = src.read(1).astype(np.float32)
+    fuel = _read_on_grid(fuel_path, profile, Resampling.nearest)
+    builtup = (_read_on_grid(builtup_path, profile, Resampling.average)
+               if builtup_path else None)
+    dem, cell_size_m, cell_width_m = None, None, None
+    if dem_path:
+        dem = _read_on_grid(dem_path, profile, Resampling.bilinear)
+        cell_size_m, cell_width_m = cell_size_metres(profile)
+
+    susceptibility, directional = compute_static_factors(slope, fuel, builtup, dem,
+                                                         cell_size_m, cell_width_m)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(susceptibility_path, susceptibility)
+    if directional is not None:
+        np.save(directional_path, directional)
+    print(f"✅ Static factors cached as {key} in {cache_dir}")
+    return susceptibility, directional
+
+
+if __name__ == "__main__":
+    slope_path = 'data/processed/terrain/dem_slope_11x13.tif'
+    fuel_path = 'data/processed/fuel/fuel_binary_11x13.tif'
+    builtup_path = None  # e.g. 'data/processed/human/ghsl_builtup_fraction_11x13.tif' (0-1)
+    dem_path = None      # e.g. 'data/processed/terrain/dem_clipped.tif' for slope-aspect factors
+
+    susceptibility, directional = load_static_factors(slope_path, fuel_path,
+                                                      builtup_path, dem_path)
+    print(f"📊 Flammable cells: {np.count_nonzero(susceptibility)} / {susceptibility.size}")
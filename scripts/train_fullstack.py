@@ -8,24 +8,30 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 import joblib
 
+from feature_store import FeatureStore
+
 # Paths
-stack_path = "data/processed/feature_stack.npz"
+store_dir  = "data/processed/feature_store"  # or feature_store_u8 (quantize_features.py) to train on bin codes
+date       = "2021-04-19"
 label_path = "data/processed/fire_labels/fire_20210419_downsampled_11x13.tif"
 model_out  = "models/fullstack_rf.joblib"
 
-# 1) Load feature stack
-data = np.load(stack_path)["features"]  # (H, W, F)
+# 1) Open the feature store (one memory-mapped file per feature)
+store = FeatureStore.open(store_dir)
+feature_names = store.feature_names(date)
 
-# 2) Load labels
+# 2) Stream blocks of features and labels, keeping only valid pixels
+#    (labels >= 0), so the full (H, W, F) cube is never in memory
+X_blocks, y_blocks = [], []
 with rasterio.open(label_path) as src:
-    labels = src.read(1)  # (H, W)
-
-# 3) Mask valid pixels (where labels >= 0)
-mask = labels >= 0
+    for window, block in store.iter_blocks(feature_names, date):
+        labels = src.read(1, window=window)
+        mask = labels >= 0
+        X_blocks.append(block[mask])
+        y_blocks.append(labels[mask].astype(int))
 
-# 4) Flatten
-X = data[mask]
-y = labels[mask].astype(int)
+X = np.concatenate(X_blocks)
+y = np.concatenate(y_blocks)
 
 print("Dataset:", X.shape, y.shape)
 print("Fire pixels:", np.sum(y == 1), "Non-fire:", np.sum(y == 0))
@@ -46,7 +52,10 @@ clf.fit(X_train, y_train)
 y_pred = clf.predict(X_test)
 print(classification_report(y_test, y_pred))
 
-# 8) Save model
+# 8) Save model, tagged with its feature order and how the store encodes the
+#    features (float32 or uint8 bin codes), which the prediction scripts check
+clf.feature_names_ = list(feature_names)
+clf.feature_encoding_ = store.feature_encoding(feature_names)
 os.makedirs(os.path.dirname(model_out), exist_ok=True)
 joblib.dump(clf, model_out)
 print("✅ Model saved to", model_out)
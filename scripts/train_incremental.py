@@ -0,0 +1,137 @@
+# scripts/train_incremental.py
+
+import json
+import os
+import resource
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import classification_report
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from build_training_dataset import MANIFEST_FILE, load_shards
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train_forest_by_shard(shards: list,
+                          trees_per_shard: int = 20,
+                          max_depth: int = None,
+                          seed: int = 42) -> RandomForestClassifier:
+    """
+    Grow a random forest shard by shard with warm_start: every shard adds
+    `trees_per_shard` trees fitted on that shard only, so only one shard is
+    in memory at a time. The result is an ordinary RandomForestClassifier.
+    """
+    clf = RandomForestClassifier(n_estimators=0, warm_start=True, max_depth=max_depth,
+                                 n_jobs=-1, random_state=seed)
+    for X, y, w in shards:
+        if np.unique(y).size < 2:
+            print(f"⚠️ Skipping a single-class shard of {len(y)} rows")
+            continue
+        clf.n_estimators += trees_per_shard
+        clf.fit(np.asarray(X), np.asarray(y), sample_weight=np.asarray(w))
+    return clf
+
+
+def train_hist_gb_by_shard(shards: list,
+                           iters_per_shard: int = 50,
+                           seed: int = 42) -> HistGradientBoostingClassifier:
+    """
+    Histogram gradient boosting continued shard by shard with warm_start:
+    each shard adds `iters_per_shard` boosting rounds fitted on that shard.
+    sklearn re-learns its bin edges from every shard it is given; earlier
+    trees keep their real-valued thresholds, so they stay valid.
+
+    Caveat: each round only sees one shard, so this is weaker than boosting
+    on all rows at once and usually scores lower; compare the held-out
+    report from `evaluate()` and prefer "forest" when accuracy matters.
+    """
+    clf = HistGradientBoostingClassifier(max_iter=0, warm_start=True, early_stopping=False,
+                                         random_state=seed)
+    for X, y, w in shards:
+        clf.max_iter += iters_per_shard
+        clf.fit(np.asarray(X), np.asarray(y), sample_weight=np.asarray(w))
+    return clf
+
+
+def train_sgd(shards: list,
+              batch_size: int = 65536,
+              epochs: int = 3,
+              seed: int = 42):
+    """
+    Logistic regression trained with SGD partial_fit over mini-batches of
+    the memory-mapped shards. A first pass fits the feature scaler the same
+    way. Returns a scaler + classifier pipeline with predict_proba.
+    """
+    scaler = StandardScaler()
+    for X, _, _ in shards:
+        for start in range(0, len(X), batch_size):
+            scaler.partial_fit(np.asarray(X[start:start + batch_size]))
+
+    clf = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=seed)
+    for _ in range(epochs):
+        for X, y, w in shards:
+            for start in range(0, len(X), batch_size):
+                batch = slice(start, start + batch_size)
+                clf.partial_fit(scaler.transform(np.asarray(X[batch])), np.asarray(y[batch]),
+                                classes=np.array([0, 1]), sample_weight=np.asarray(w[batch]))
+    return make_pipeline(scaler, clf)
+
+
+def evaluate(model, shard: tuple, batch_size: int = 65536):
+    X, y, w = shard
+    y_pred = np.concatenate([model.predict(np.asarray(X[s:s + batch_size]))
+                             for s in range(0, len(X), batch_size)])
+    print(classification_report(np.asarray(y), y_pred, sample_weight=np.asarray(w), zero_division=0))
+
+
+if __name__ == "__main__":
+    # Paths
+    dataset_dir = "data/processed/training_dataset"   # from build_training_dataset.py
+    mode        = "forest"   # "forest" (warm-start RF, works with compiled_forest.py) | "hist_gb" (less accurate, see above) | "sgd"
+    model_out   = f"models/fullstack_{mode}_incremental.joblib"
+
+    with open(os.path.join(dataset_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    shards = list(load_shards(dataset_dir))
+    if not shards:
+        raise ValueError(f"No shards found in {dataset_dir}")
+    if len(shards) > 1:
+        train_shards, holdout = shards[:-1], shards[-1]  # last shard held out for evaluation
+    else:
+        print("⚠️ Only one shard: training on it without a held-out evaluation")
+        train_shards, holdout = shards, None
+    n_rows = sum(len(y) for _, y, _ in train_shards)
+    n_holdout = len(holdout[1]) if holdout is not None else 0
+    print(f"📊 {n_rows} training rows in {len(train_shards)} shards, "
+          f"{len(manifest['features'])} features, {n_holdout} held-out rows")
+
+    # 1) Train
+    start = time.perf_counter()
+    if mode == "forest":
+        model = train_forest_by_shard(train_shards)
+    elif mode == "hist_gb":
+        model = train_hist_gb_by_shard(train_shards)
+    else:
+        model = train_sgd(train_shards)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ Trained {mode} in {elapsed:.1f}s ({n_rows / elapsed:,.0f} rows/s), "
+          f"peak RSS {_peak_rss_mb():.0f} MB")
+
+    # 2) Evaluate on the held-out shard (weights undo the class sampling)
+    if holdout is not None:
+        evaluate(model, holdout)
+
+    # 3) Save; feature order and encoding are the store's, as predict_fullstack.py expects
+    model.feature_names_ = list(manifest["features"])
+    model.feature_encoding_ = manifest.get("encoding", {"dtype": "float32"})
+    os.makedirs(os.path.dirname(model_out), exist_ok=True)
+    joblib.dump(model, model_out)
+    print("✅ Model saved to", model_out)
@@ -0,0 +1,174 @@
+# scripts/weather_features.py
+
+import os
+import time
+
+import numpy as np
+import xarray as xr
+from rasterio.crs import CRS
+
+from extract_era5_to_tif import (ACCUM_VARS, INSTANT_VARS, accum_nc, compute_chunk, dask,
+                                 era5_fields, era5_grid, instant_nc, relative_humidity)
+from feature_store import FeatureStore
+
+DAILY_FEATURES = ("t2m_max", "precip_total", "wind_mean", "wind_max", "wind_dir_dominant",
+                  "hours_since_rain", "rh_min", "fire_index")
+
+
+def vapour_pressure_deficit(t2m, d2m):
+    """Vapour pressure deficit (hPa) from 2 m temperature and dewpoint in Kelvin."""
+    t, td = t2m - 273.15, d2m - 273.15
+    return 6.112 * (np.exp(17.625 * t / (243.04 + t)) - np.exp(17.625 * td / (243.04 + td)))
+
+
+class DailyWeather:
+    """
+    Daily weather aggregates accumulated from hourly ERA5 frames.
+
+    `update` takes a chunk of consecutive hours, as (n, H, W) arrays in ERA5
+    units (t2m/d2m in K, tp in m, u10/v10 in m/s), and folds it into
+    running per-pixel statistics; `finish` returns the day's features and
+    starts a new day. Features (float32, in DAILY_FEATURES order):
+      t2m_max            maximum temperature (°C)
+      precip_total       total precipitation (mm)
+      wind_mean/max      mean and maximum 10 m wind speed (m/s)
+      wind_dir_dominant  direction of the mean wind vector, degrees the wind
+                         blows from (clockwise from north)
+      hours_since_rain   hours since the last hour with >= `rain_mm` of
+                         rain, carried across days (counted from the start
+                         of the series until it first rains)
+      rh_min             minimum relative humidity (%)
+      fire_index         Hot-Dry-Windy index: max hourly VPD (hPa) x wind (m/s)
+    rh_min and fire_index need d2m and are left out without it.
+    """
+
+    def __init__(self, shape: tuple, rain_mm: float = 0.2):
+        self.shape = shape
+        self.rain_mm = rain_mm
+        self.hours_since_rain = np.zeros(shape, dtype=np.float32)
+        self._reset()
+
+    def _reset(self):
+        self.n_hours = 0
+        self.t_max = np.full(self.shape, -np.inf, dtype=np.float32)
+        self.precip = np.zeros(self.shape, dtype=np.float32)
+        self.speed_sum = np.zeros(self.shape, dtype=np.float32)
+        self.speed_max = np.zeros(self.shape, dtype=np.float32)
+        self.u_sum = np.zeros(self.shape, dtype=np.float32)
+        self.v_sum = np.zeros(self.shape, dtype=np.float32)
+        self.rh_min = None
+        self.hdw_max = None
+
+    def update(self, t2m: np.ndarray, u10: np.ndarray, v10: np.ndarray, tp: np.ndarray,
+               d2m: np.ndarray = None):
+        n = len(t2m)
+        speed = np.hypot(u10, v10)
+        self.n_hours += n
+        self.t_max = np.maximum(self.t_max, t2m.max(axis=0) - 273.15)
+        self.precip += tp.sum(axis=0) * 1000
+        self.speed_sum += speed.sum(axis=0)
+        self.speed_max = np.maximum(self.speed_max, speed.max(axis=0))
+        self.u_sum += u10.sum(axis=0)
+        self.v_sum += v10.sum(axis=0)
+
+        # Hours since rain at the end of the chunk: from its last rainy hour, else carried on
+        rain = tp * 1000 >= self.rain_mm
+        hours_after_rain = np.argmax(rain[::-1], axis=0)
+        self.hours_since_rain = np.where(rain.any(axis=0), hours_after_rain,
+                                         self.hours_since_rain + n).astype(np.float32)
+
+        if d2m is not None:
+            rh_min = relative_humidity(t2m, d2m).min(axis=0)
+            hdw_max = (vapour_pressure_deficit(t2m, d2m) * speed).max(axis=0)
+            self.rh_min = rh_min if self.rh_min is None else np.minimum(self.rh_min, rh_min)
+            self.hdw_max = hdw_max if self.hdw_max is None else np.maximum(self.hdw_max, hdw_max)
+
+    def finish(self) -> dict:
+        """The day's {feature name: (H, W) float32}; daily statistics restart."""
+        if self.n_hours == 0:
+            raise ValueError("No hours accumulated for this day")
+        features = {
+            "t2m_max": self.t_max,
+            "precip_total": self.precip,
+            "wind_mean": self.speed_sum / self.n_hours,
+            "wind_max": self.speed_max,
+            "wind_dir_dominant": np.degrees(np.arctan2(-self.u_sum, -self.v_sum)) % 360,
+            "hours_since_rain": self.hours_since_rain.copy(),
+        }
+        if self.rh_min is not None:
+            features["rh_min"] = self.rh_min
+            features["fire_index"] = self.hdw_max
+        self._reset()
+        return {name: np.asarray(value, dtype=np.float32) for name, value in features.items()}
+
+
+def daily_weather_features(instant_path: str = instant_nc,
+                           accum_path: str = accum_nc,
+                           rain_mm: float = 0.2):
+    """
+    Stream (date, {feature: (H, W) float32}) over the days of the ERA5
+    files, in one pass over time. Each day's hours are read as one chunk
+    (lazily through dask when installed) and folded into a `DailyWeather`;
+    only one day of hourly frames is in memory at a time.
+    """
+    with xr.open_dataset(instant_path) as probe:
+        time_coord, _, flip = era5_grid(probe)
+    chunks = {time_coord: 24} if dask is not None else None
+    with xr.open_dataset(instant_path, chunks=chunks) as instant, \
+            xr.open_dataset(accum_path, chunks=chunks) as accum:
+        times = instant[time_coord].values.astype("datetime64[h]")
+        if not np.array_equal(times, accum[time_coord].values.astype("datetime64[h]")):
+            raise ValueError(f"{instant_path} and {accum_path} cover different hours")
+        days = times.astype("datetime64[D]")
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        bounds = np.r_[starts, len(days)]
+
+        engine = DailyWeather((instant.sizes["latitude"], instant.sizes["longitude"]), rain_mm)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            window = {time_coord: slice(int(start), int(stop))}
+            fields = era5_fields(instant.isel(window), INSTANT_VARS, time_coord, derived=False)
+            fields.update(era5_fields(accum.isel(window), ACCUM_VARS, time_coord, derived=False))
+            hourly = compute_chunk(fields)
+            if flip:
+                hourly = {name: frames[:, ::-1] for name, frames in hourly.items()}
+            engine.update(hourly["t2m"], hourly["u10"], hourly["v10"], hourly["precip"],
+                          hourly.get("d2m"))
+            yield str(days[start]), engine.finish()
+
+
+if __name__ == "__main__":
+    # Paths (ERA5 NetCDFs as in extract_era5_to_tif.py)
+    main_store_dir = "data/processed/feature_store"        # static layers are copied from here
+    out_dir        = "data/processed/feature_store_daily"  # train/predict on it by pointing store_dir here
+
+    # Settings
+    rain_mm = 0.2   # an hour with at least this much rain resets hours_since_rain
+
+    with xr.open_dataset(instant_nc) as ds:
+        _, transform, _ = era5_grid(ds)
+        profile = {"height": ds.sizes["latitude"], "width": ds.sizes["longitude"],
+                   "crs": CRS.from_epsg(4326), "transform": transform}
+    store = FeatureStore.open_or_create(out_dir, profile)
+
+    # 1) Static layers (DEM, fuel, built-up) from the main store, when on the same grid
+    n_hourly = 0
+    if os.path.exists(os.path.join(main_store_dir, "store.json")):
+        main_store = FeatureStore.open(main_store_dir)
+        if main_store.shape == store.shape:
+            for name in main_store.feature_names():
+                store.write_feature(name, np.asarray(main_store.feature(name)))
+            n_hourly = len(main_store.feature_names(main_store.dates()[-1], include_static=False)) \
+                if main_store.dates() else 0
+        else:
+            print(f"⚠️ {main_store_dir} is on a {main_store.shape} grid, not {store.shape}; "
+                  f"static layers not copied")
+
+    # 2) Daily weather features, one pass over the ERA5 hours
+    start = time.perf_counter()
+    for date, features in daily_weather_features(rain_mm=rain_mm):
+        store.append_date(date, features)
+        print(f"✅ {date}: {len(features)} weather features")
+    print(f"⏱️ Daily weather features in {time.perf_counter() - start:.1f}s")
+    if n_hourly:
+        print(f"📊 {len(features)} daily weather features per day instead of {n_hourly} hourly bands")
+    print("✅ Saved daily feature store to", out_dir)
@@ -0,0 +1,149 @@
+import glob
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.warp import reproject, Resampling
+from rasterio.windows import Window, transform as window_transform
+
+
+class _LazyFrames:
+    """Hourly frames of one NetCDF variable, each read from disk on first access."""
+
+    def __init__(self, data, time_coord: str, flip: bool):
+        self.data = data
+        self.time_coord = time_coord
+        self.flip = flip
+        self.loaded = {}
+
+    def __len__(self):
+        return self.data.sizes[self.time_coord]
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        if i not in self.loaded:
+            frame = self.data.isel({self.time_coord: i}).squeeze().values.astype(np.float32)
+            self.loaded[i] = np.flipud(frame) if self.flip else frame
+        return self.loaded[i]
+
+
+class WindField:
+    """
+    ERA5 10 m wind (u10, v10) as a time series, served on the simulation grid.
+
+    Source frames are loaded once (or lazily, from NetCDF) and kept at their
+    native coarse resolution. `frame(hour)` linearly interpolates between the
+    two surrounding hours, so any sub-hour step works, then resamples to the
+    destination grid. The most recent resampled frames are kept in an LRU
+    cache of `cache_size` entries; on a full-resolution grid each entry costs
+    2 x H x W float32, so keep it small there.
+    """
+
+    def __init__(self,
+                 u_frames,
+                 v_frames,
+                 src_transform,
+                 src_crs,
+                 dst_profile: dict,
+                 cache_size: int = 4,
+                 resampling: Resampling = Resampling.bilinear):
+        self.u_frames = u_frames
+        self.v_frames = v_frames
+        self.n_hours = len(u_frames)
+        self.src_transform = src_transform
+        self.src_crs = src_crs
+        self.dst_transform = dst_profile["transform"]
+        self.dst_crs = dst_profile["crs"]
+        self.dst_shape = (dst_profile["height"], dst_profile["width"])
+        self.cache_size = cache_size
+        self.resampling = resampling
+        self._cache = OrderedDict()
+
+    @classmethod
+    def from_tifs(cls, weather_dir: str, dst_profile: dict, **kwargs):
+        """Load every `u10_HH.tif` / `v10_HH.tif` written by extract_era5_to_tif.py."""
+        def load(var):
+            hours = {}
+            for path in glob.glob(os.path.join(weather_dir, f"{var}_*.tif")):
+                match = re.fullmatch(rf"{var}_(\d+)\.tif", os.path.basename(path))
+                if match:
+                    hours[path] = int(match.group(1))
+            # Numeric order: u10_100.tif comes after u10_99.tif, not before u10_11.tif
+            paths = sorted(hours, key=hours.get)
+            frames = []
+            for path in paths:
+                with rasterio.open(path) as src:
+                    frames.append(src.read(1).astype(np.float32))
+                    transform, crs = src.transform, src.crs
+            return np.stack(frames), transform, crs
+
+        u, transform, crs = load("u10")
+        v, _, _ = load("v10")
+        return cls(u, v, transform, crs, dst_profile, **kwargs)
+
+    @classmethod
+    def from_netcdf(cls, nc_path: str, dst_profile: dict, **kwargs):
+        """Read u10/v10 lazily from the ERA5 'instant' NetCDF; frames load on first use."""
+        import xarray as xr
+
+        ds = xr.open_dataset(nc_path)
+        time_coord = 'time' if 'time' in ds.coords else 'valid_time'
+        lat = ds.latitude.values
+        lon = ds.longitude.values
+        transform = from_origin(lon.min(), lat.max(), abs(lon[1] - lon[0]), abs(lat[1] - lat[0]))
+        flip = lat[0] < lat[-1]
+        u = _LazyFrames(ds["u10"], time_coord, flip)
+        v = _LazyFrames(ds["v10"], time_coord, flip)
+        return cls(u, v, transform, "EPSG:4326", dst_profile, **kwargs)
+
+    def _interpolate(self, frames, hour: float) -> np.ndarray:
+        hour = min(max(hour, 0.0), self.n_hours - 1)
+        i0 = int(np.floor(hour))
+        i1 = min(i0 + 1, self.n_hours - 1)
+        w = np.float32(hour - i0)
+        if w == 0 or i0 == i1:
+            return frames[i0]
+        return (1 - w) * frames[i0] + w * frames[i1]
+
+    def _resample(self, data: np.ndarray, window: Window = None) -> np.ndarray:
+        if window is None:
+            shape, dst_transform = self.dst_shape, self.dst_transform
+        else:
+            shape = (int(window.height), int(window.width))
+            dst_transform = window_transform(window, self.dst_transform)
+        out = np.zeros(shape, dtype=np.float32)
+        reproject(
+            source=data,
+            destination=out,
+            src_transform=self.src_transform,
+            src_crs=self.src_crs,
+            dst_transform=dst_transform,
+            dst_crs=self.dst_crs,
+            resampling=self.resampling
+        )
+        return out
+
+    def frame(self, hour: float):
+        """Return (wind_u, wind_v) on the destination grid at `hour` (index into the series)."""
+        key = round(float(hour), 6)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        wind = (self._resample(self._interpolate(self.u_frames, key)),
+                self._resample(self._interpolate(self.v_frames, key)))
+        self._cache[key] = wind
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return wind
+
+    def frame_window(self, hour: float, window: Window):
+        """
+        (wind_u, wind_v) at `hour` on one window of the destination grid, for
+        out-of-core engines: only the window is resampled, nothing is cached.
+        """
+        key = round(float(hour), 6)
+        return (self._resample(self._interpolate(self.u_frames, key), window),
+                self._resample(self._interpolate(self.v_frames, key), window))